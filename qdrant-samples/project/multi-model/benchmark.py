@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from qdrant_client import QdrantClient
+
+import main
+from embedding_cache import EmbeddingCache
+from preprocess import preprocess_batches
+from streaming import batched
+
+# End-to-end speed numbers for the multi-model ingest and query paths, run
+# against local-mode Qdrant (":memory:" or an on-disk path) so no server is needed.
+#
+#   python benchmark.py --images 512 --vectors 20000 --output bench.json
+
+
+def percentile_summary(latencies):
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean())
+    }
+
+def make_synthetic_images(source_dir, count, out_dir, seed=0):
+    # random crops of the bundled images, re-encoded, so every file has its own content hash
+    rng = random.Random(seed)
+    sources = [os.path.join(source_dir, f) for f in sorted(os.listdir(source_dir)) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    paths = []
+    for i in range(count):
+        with Image.open(sources[i % len(sources)]) as img:
+            img = img.convert("RGB")
+            width, height = img.size
+            crop_w = int(width * rng.uniform(0.7, 1.0))
+            crop_h = int(height * rng.uniform(0.7, 1.0))
+            left = rng.randint(0, width - crop_w)
+            top = rng.randint(0, height - crop_h)
+            path = os.path.join(out_dir, f"synthetic_{i:06d}.jpg")
+            img.crop((left, top, left + crop_w, top + crop_h)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+def make_distinct_images(count, out_dir, seed=0):
+    # upscaled random noise: unlike crops of the bundled photos, no two share a perceptual hash
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        img = Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)).resize((256, 256), Image.BILINEAR)
+        path = os.path.join(out_dir, f"distinct_{i:06d}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+def make_near_duplicates(paths, count, out_dir):
+    # smaller, lower-quality re-encodes: new bytes, so the embedding cache misses them, same photo
+    copies = []
+    for i in range(count):
+        with Image.open(paths[i % len(paths)]) as img:
+            width, height = img.size
+            path = os.path.join(out_dir, f"copy_{i:06d}.jpg")
+            img.convert("RGB").resize((width * 3 // 4, height * 3 // 4), Image.BILINEAR).save(path, quality=70)
+        copies.append(path)
+    return copies
+
+def bench_decode(paths, batch_size):
+    start = time.perf_counter()
+    decoded = 0
+    for rows, _, _ in preprocess_batches(paths, batch_size, executor=main.get_preprocess_pool(), config=main.get_image_preprocess()):
+        decoded += len(rows)
+    elapsed = time.perf_counter() - start
+    return {"images": decoded, "seconds": elapsed, "images_per_sec": decoded / elapsed}
+
+def bench_image_embedding(paths, batch_size):
+    start = time.perf_counter()
+    _, valid = main.embedding_images(paths, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {"images": int(valid.sum()), "seconds": elapsed, "embeddings_per_sec": int(valid.sum()) / elapsed}
+
+def bench_text_embedding(count, batch_size):
+    texts = [f"animal cat This is synthetic cat description number {i}." for i in range(count)]
+    start = time.perf_counter()
+    main.embedding_texts(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {"texts": count, "seconds": elapsed, "embeddings_per_sec": count / elapsed}
+
+def synthetic_columns(count, rng):
+    # (ids, {name: (count, dim) float32}, payloads), the same shape main.animal_columns produces
+    vectors = {
+        "image": rng.standard_normal((count, main.IMAGE_DIM), dtype=np.float32),
+        "text": rng.standard_normal((count, main.TEXT_DIM), dtype=np.float32)
+    }
+    payloads = [
+        main.point_payload(f"synthetic/synthetic_{i:06d}.jpg", f"synthetic_{i:06d}.jpg", "animal", f"This is synthetic cat {i}.", "cat")
+        for i in range(count)
+    ]
+    return list(range(count)), vectors, payloads
+
+def bench_upsert(collection_name, count, batch_size, rng):
+    ids, vectors, payloads = synthetic_columns(count, rng)
+    start = time.perf_counter()
+    uploaded = main.save_vectors_to_qdrant(collection_name, ids, vectors, payloads, batch_size=batch_size, parallel=1)
+    elapsed = time.perf_counter() - start
+    return {"points": uploaded, "seconds": elapsed, "points_per_sec": (uploaded or 0) / elapsed}
+
+def bench_queries(collection_name, queries, concurrency, top_k):
+    def one(query):
+        vector_name, vector = query
+        start = time.perf_counter()
+        main.get_client().query_points(collection_name=collection_name, query=vector, using=vector_name, limit=top_k)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, queries))
+    elapsed = time.perf_counter() - start
+    result = percentile_summary(latencies)
+    result.update({"concurrency": concurrency, "queries": len(queries), "qps": len(queries) / elapsed})
+    return result
+
+def bench_dedup_ingest(collection_name, count, ratios, index_size, mode, chunk_size, work_dir, seed):
+    # ingest_paths throughput per share of near-duplicates in the input; duplicates skip
+    # decode and the image model, so images/sec should rise with the ratio. The hash index
+    # starts with index_size random hashes, standing in for a large existing collection.
+    rng = random.Random(seed)
+    results = []
+    for ratio in ratios:
+        run_dir = os.path.join(work_dir, f"dedup_{ratio:.2f}")
+        os.makedirs(run_dir)
+        duplicates = min(int(round(count * ratio)), count - 1)
+        originals = make_distinct_images(count - duplicates, run_dir, seed=seed)
+        paths = originals + make_near_duplicates(originals, duplicates, run_dir)
+        rng.shuffle(paths)
+        items = [(path, f"This is synthetic cat {i}.") for i, path in enumerate(paths)]
+
+        main.get_image_cache.override(EmbeddingCache(main.IMAGE_MODEL_NAME, main.IMAGE_DIM, cache_dir=run_dir, max_entries=count))
+        main.get_text_cache.override(EmbeddingCache(main.TEXT_MODEL_NAME, main.TEXT_DIM, cache_dir=run_dir, max_entries=count))
+        main.PHASH_DIR = run_dir
+        collection = f"{collection_name}_dup{int(ratio * 100)}"
+        main.create_collection(collection)
+        index = main.get_phash_index(collection)
+        for i in range(index_size):
+            index.add(rng.getrandbits(64), f"preloaded-{i}")
+
+        start = time.perf_counter()
+        for chunk in batched(items, chunk_size):
+            main.ingest_paths(collection, chunk, dedup=mode)
+        elapsed = time.perf_counter() - start
+        embedded = len(index) - index_size
+        results.append({
+            "duplicate_ratio": ratio,
+            "images": count,
+            "embedded": embedded,
+            "skipped": count - embedded,
+            "seconds": elapsed,
+            "images_per_sec": count / elapsed
+        })
+        print(f"dedup {mode}, {ratio:.0%} near-duplicates: {count / elapsed:.1f} images/sec ({count - embedded} skipped the image model).")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    main.get_client.override(QdrantClient(location=":memory:") if args.qdrant_path is None else QdrantClient(path=args.qdrant_path))
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # fresh caches so the numbers measure the models, not previous runs
+        main.get_image_cache.override(EmbeddingCache(main.IMAGE_MODEL_NAME, main.IMAGE_DIM, cache_dir=work_dir, max_entries=max(args.images, 1)))
+        main.get_text_cache.override(EmbeddingCache(main.TEXT_MODEL_NAME, main.TEXT_DIM, cache_dir=work_dir, max_entries=max(args.texts, 1)))
+
+        paths = make_synthetic_images(args.image_dir, args.images, work_dir, seed=args.seed)
+        print(f"Benchmarking with {len(paths)} synthetic images and {args.vectors} synthetic vectors.")
+        results["decode"] = bench_decode(paths, args.batch_size)
+        results["image_embedding"] = bench_image_embedding(paths, args.batch_size)
+        results["text_embedding"] = bench_text_embedding(args.texts, args.batch_size)
+
+        main.create_collection(args.collection)
+        results["upsert"] = bench_upsert(args.collection, args.vectors, args.upsert_batch_size, rng)
+
+        image_dim = main.IMAGE_DIM
+        text_dim = main.TEXT_DIM
+        queries = [
+            ("image", rng.standard_normal(image_dim, dtype=np.float32)) if i % 2 else
+            ("text", rng.standard_normal(text_dim, dtype=np.float32))
+            for i in range(args.queries)
+        ]
+        results["query"] = [bench_queries(args.collection, queries, concurrency, args.top_k) for concurrency in args.concurrency]
+
+        if args.duplicate_ratios:
+            results["dedup_ingest"] = bench_dedup_ingest(
+                args.collection, args.images, args.duplicate_ratios, args.phash_index_size,
+                args.dedup_mode, args.upsert_batch_size, work_dir, args.seed
+            )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Benchmark report written to {args.output}")
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark multi-model ingest and query paths against local Qdrant.")
+    parser.add_argument("--image-dir", default="images/cats")
+    parser.add_argument("--images", type=int, default=256, help="synthetic images built from --image-dir")
+    parser.add_argument("--texts", type=int, default=1024)
+    parser.add_argument("--vectors", type=int, default=10_000, help="synthetic points for the upsert/query benchmarks")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=main.IMAGE_BATCH_SIZE)
+    parser.add_argument("--upsert-batch-size", type=int, default=main.UPSERT_BATCH_SIZE)
+    parser.add_argument("--duplicate-ratios", type=float, nargs="*", default=[0.0, 0.25, 0.5, 0.75],
+                        help="near-duplicate shares for the dedup ingest benchmark (none to skip it)")
+    parser.add_argument("--dedup-mode", choices=["alias", "reuse"], default="reuse")
+    parser.add_argument("--phash-index-size", type=int, default=100_000, help="random hashes preloaded into the dedup index")
+    parser.add_argument("--collection", default="benchmark_image_search")
+    parser.add_argument("--qdrant-path", default=None, help="on-disk local Qdrant directory (default: in memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
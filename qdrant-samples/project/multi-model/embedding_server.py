@@ -0,0 +1,45 @@
+import argparse
+
+import main
+from model_server import DEFAULT_SOCKET , EmbeddingServer
+
+# Loads the image and text models once and serves every local process:
+#
+#   python embedding_server.py --socket /tmp/embedding_server.sock
+#   EMBEDDING_SERVER=/tmp/embedding_server.sock python main.py
+#
+# The socket is owner-only. Set the same EMBEDDING_SERVER_AUTHKEY for the server
+# and its clients to also require a shared key on every connection.
+#
+# Clients keep their own embedding caches and preprocessing; only the model
+# forward passes run here. Start the server with the same EMBEDDING_BACKEND as
+# the clients so their cache names match the vectors it returns.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve image/text embeddings over a Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=64, help="rows per model call across all callers")
+    parser.add_argument("--window", type=float, default=0.005, help="seconds to wait for more requests before running a batch")
+    parser.add_argument("--no-image", action="store_true")
+    parser.add_argument("--no-text", action="store_true")
+    return parser.parse_args(argv)
+
+def run(args):
+    image_backend = None if args.no_image else main.load_image_backend()
+    text_backend = None if args.no_text else main.load_text_backend()
+    server = EmbeddingServer(
+        image_embed=image_backend.embed if image_backend else None,
+        text_encode=(lambda texts: text_backend.encode(texts, batch_size=main.TEXT_BATCH_SIZE)) if text_backend else None,
+        address=args.socket,
+        max_batch=args.max_batch,
+        window=args.window
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Embedding server stopped.")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -50,27 +50,145 @@ def cat_description():
         
 
 
+import atexit
 import datetime
+import json
+import queue
+import threading
+import time
 
 # ---- Logger Class ----
-class Logger:
-    def __init__(self, log_file="logfile.txt"):
-        self.log_file = log_file
-
-    def log(self, level, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"[{timestamp}] [{level.upper()}] {message}\n"
-        with open(self.log_file, "a", encoding="utf-8") as file:
-            file.write(entry)
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
 
-    def info(self, message):
-        self.log("INFO", message)
+_STOP = object()
 
-    def warning(self, message):
-        self.log("WARNING", message)
-
-    def error(self, message):
-        self.log("ERROR", message)
+class Logger:
+    # log() only enqueues; a background thread formats records and appends them
+    # in batches (every flush_interval seconds or batch_size records), rotating
+    # log_file -> log_file.1 ... once it grows past max_bytes.
+    def __init__(
+            self,
+            log_file="logfile.txt",
+            json_lines=False,
+            flush_interval=1.0,
+            batch_size=512,
+            max_bytes=10 * 1024 * 1024,
+            backup_count=3,
+            max_queue=100_000
+            ):
+        self.log_file = log_file
+        self.json_lines = json_lines
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.closed = False
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, level, message, **fields):
+        try:
+            self.queue.put_nowait((time.time(), level.upper(), message, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def info(self, message, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message, **fields):
+        self.log("WARNING", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("ERROR", message, **fields)
+
+    def flush(self, timeout=5.0):
+        if self.closed:
+            return
+        request = _Flush()
+        self.queue.put(request)
+        request.done.wait(timeout)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_STOP)
+        self.thread.join(timeout=5.0)
+
+    def _format(self, record):
+        created, level, message, fields = record
+        if self.json_lines:
+            entry = {
+                "timestamp": datetime.datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+                "level": level,
+                "message": message
+            }
+            entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        timestamp = datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        entry = f"[{timestamp}] [{level}] {message}"
+        if fields:
+            entry += " " + json.dumps(fields, ensure_ascii=False, default=str)
+        return entry + "\n"
+
+    def _rotate(self, file):
+        file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.log_file}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.log_file}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        return open(self.log_file, "a", encoding="utf-8")
+
+    def _write(self, file, records):
+        if not records:
+            return file
+        data = "".join(self._format(record) for record in records)
+        if self.max_bytes and file.tell() > 0 and file.tell() + len(data) > self.max_bytes:
+            file = self._rotate(file)
+        file.write(data)
+        file.flush()
+        return file
+
+    def _run(self):
+        file = open(self.log_file, "a", encoding="utf-8")
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if isinstance(item, _Flush):
+                    file = self._write(file, pending)
+                    pending = []
+                    item.done.set()
+                    continue
+                if item is not None:
+                    pending.append(item)
+
+                if len(pending) >= self.batch_size or time.monotonic() >= deadline:
+                    try:
+                        file = self._write(file, pending)
+                    except OSError as e:
+                        print(f"Error writing log file: {e}")
+                    pending = []
+                    deadline = time.monotonic() + self.flush_interval
+            file = self._write(file, pending)
+        finally:
+            file.close()
 
 
 
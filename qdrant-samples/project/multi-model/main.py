@@ -1,26 +1,182 @@
-from PIL import Image , UnidentifiedImageError
-from transformers import AutoFeatureExtractor , AutoModel
+import heapq
+import multiprocessing
 import os 
-import torch 
-from sentence_transformers import SentenceTransformer
+import random
+import time
+import numpy as np
+import sys
+from functools import partial
 from help import Animal , count_images , cat_description , Logger
+from streaming import AsyncUploader , batched , decode_images
+from preprocess import preprocess_batches , preprocess_config , preprocess_image
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from manifest import load_manifest , point_id_for , save_manifest , scan_changes
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from embedding_cache import EmbeddingCache , encode_with_cache , file_hash
+from query_cache import LRUCache , ResultCache
+from local_engine import LocalVectorClient
+import metrics
+from storage_profiles import collection_search_params , forget_collection_profile , quantization_config , vector_params
+from dim_reduction import Reducer
+from embedding_backends import EMBEDDING_BACKEND , build_image_backend , build_text_backend
+from lazy import lazy
+from payload_indexes import build_filter , create_payload_indexes
+from model_server import EMBEDDING_SERVER , EmbeddingClient , RemoteImageBackend , RemoteTextBackend
+from perceptual_hash import HashIndex , image_hash , popcount
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance , VectorParams , PointStruct
+from qdrant_client.models import Distance , HnswConfigDiff , PointStruct , PointIdsList
+from qdrant_client.http.models import (
+    FormulaQuery ,
+    Fusion ,
+    FusionQuery ,
+    MultExpression ,
+    Prefetch ,
+    RecommendInput ,
+    RecommendQuery ,
+    RecommendStrategy ,
+    SumExpression
+)
+
+
+
+IMAGE_BATCH_SIZE = 32
+TEXT_BATCH_SIZE = 64
+UPSERT_BATCH_SIZE = 256
+UPSERT_PARALLEL = 4
+DECODE_WORKERS = 4
+PREPROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MANIFEST_DIR = ".manifests"
+REDUCER_DIR = ".reducers"
+PHASH_DIR = ".phash"
+PHASH_KIND = "dhash"  # "ahash", "dhash" or "phash"
+PHASH_MAX_DISTANCE = 4  # Hamming distance (of 64 bits) that still counts as the same photo
+# near-duplicate handling in ingest_paths: "off", "alias" (the file is added to the
+# matching point's "aliases" payload) or "reuse" (own point, matching image vector copied)
+DEDUP_MODE = os.environ.get("DEDUP_MODE", "off")
+QUERY_CACHE_SIZE = 4096
+RESULT_CACHE_SIZE = 10_000
+RESULT_CACHE_TTL = 60.0
+# payload indexes created with the collection (see get_points for the payload)
+PAYLOAD_INDEXES = {
+    "category": "keyword",
+    "type_of_category": "keyword",
+    "file_name": "keyword",
+    "path": "keyword",
+    "description": "text"
+}
+# filtered searches whose matching vectors (estimated by Qdrant from the payload
+# indexes) stay under this many KB skip HNSW and are scored exactly (Qdrant's default)
+FULL_SCAN_THRESHOLD_KB = 10_000
+HYBRID_PREFETCH_LIMIT = 50  # candidates per named vector before fusion
+
+IMAGE_MODEL_NAME = "google/vit-base-patch16-224"
+TEXT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+IMAGE_DIM = 768  # ViT-base CLS token
+TEXT_DIM = 384  # all-MiniLM-L6-v2
+
+QDRANT_HOST = '192.168.110.18'
+QDRANT_PORT = 6333
+QDRANT_LOCAL = os.environ.get("QDRANT_LOCAL") == "1"  # exact in-process NumPy engine, no server needed
+
+# Models, backends, caches and the client are loaded on first use, so a
+# text-only query never pays for the ViT and importing this module is cheap.
+# warm_up() loads everything up front for long-running servers.
+
+@lazy
+def get_extractor():
+    from transformers import AutoFeatureExtractor
+    return AutoFeatureExtractor.from_pretrained(IMAGE_MODEL_NAME)
+
+@lazy
+def get_image_model():
+    from transformers import AutoModel
+    return AutoModel.from_pretrained(IMAGE_MODEL_NAME)
+
+@lazy
+def get_text_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(TEXT_MODEL_NAME)  # Lightweight model for embeddings
+
+@lazy
+def get_image_preprocess():
+    return preprocess_config(get_extractor())
+
+def load_image_backend():
+    return build_image_backend(get_image_model(), IMAGE_MODEL_NAME, image_size=get_image_preprocess()["size"])
+
+def load_text_backend():
+    return build_text_backend(get_text_model(), TEXT_MODEL_NAME)
+
+# EMBEDDING_SERVER=/path/to.sock: embed through a shared embedding_server.py
+# process instead of loading the model weights into this one
+@lazy
+def get_embedding_client():
+    return EmbeddingClient(EMBEDDING_SERVER)
+
+@lazy
+def get_image_backend():
+    return RemoteImageBackend(get_embedding_client()) if EMBEDDING_SERVER else load_image_backend()
 
+@lazy
+def get_text_backend():
+    return RemoteTextBackend(get_embedding_client()) if EMBEDDING_SERVER else load_text_backend()
 
+def cache_model_name(model_name):
+    # ONNX/int8 vectors differ slightly from PyTorch ones, so they get their own caches;
+    # keyed on the configured backend so cache hits never need the model loaded
+    return model_name if EMBEDDING_BACKEND == "torch" else f"{model_name}@{EMBEDDING_BACKEND}"
 
-extractor = AutoFeatureExtractor.from_pretrained("google/vit-base-patch16-224")
-model = AutoModel.from_pretrained("google/vit-base-patch16-224")
-text_model = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight model for embeddings
+@lazy
+def get_image_cache():
+    return EmbeddingCache(cache_model_name(IMAGE_MODEL_NAME), IMAGE_DIM)
 
-client = QdrantClient('192.168.110.18' , port=6333)
+@lazy
+def get_text_cache():
+    return EmbeddingCache(cache_model_name(TEXT_MODEL_NAME), TEXT_DIM)
+
+@lazy
+def get_client():
+    return LocalVectorClient() if QDRANT_LOCAL else QdrantClient(QDRANT_HOST , port=QDRANT_PORT)
+
+@lazy
+def get_preprocess_pool():
+    # never fork: this process already runs the logger thread (and torch's), and a
+    # forked child can inherit a lock held by one of them. forkserver workers start
+    # clean and import what they run (preprocess, perceptual_hash), models stay lazy
+    return ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+
+def restart_preprocess_pool(error):
+    # a worker killed mid-task (OOM, a crashing decoder) breaks the pool for good:
+    # every later submit would fail, so the next get_preprocess_pool() builds a new one
+    logg.warning("Preprocess pool broke, starting a new one", error=str(error))
+    get_preprocess_pool().shutdown(wait=False, cancel_futures=True)
+    get_preprocess_pool.reset()
+
+def warm_up(image=True, text=True):
+    # preload for servers/workers: load models and run one tiny batch through each
+    start = time.perf_counter()
+    if image:
+        size = get_image_preprocess()["size"]
+        embed_pixel_values(np.zeros((1, 3, size, size), dtype=np.float32))
+    if text:
+        encode_texts(["warm up"])
+    get_client()
+    print(f"Warm-up done in {time.perf_counter() - start:.2f}s.")
+
+image_reducers = {}
+phash_indexes = {}
+query_vectors = LRUCache(maxsize=QUERY_CACHE_SIZE)
+search_results = ResultCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
 logg = Logger()
 
 
 def is_collection_exists(collection_name):
     try:
-        res = client.collection_exists(collection_name=collection_name)
+        res = get_client().collection_exists(collection_name=collection_name)
         if res:
             print(f"Collection '{collection_name}' exists.")
             return True
@@ -31,43 +187,199 @@ def is_collection_exists(collection_name):
         print(f"Error checking collection existence: {e}")
         return False
 
-def create_collection(collection_name):
+def create_collection(collection_name, profile=None):
+    # profile: storage profile name from storage_profiles (default: STORAGE_PROFILE env var)
     try:
         if not is_collection_exists(collection_name=collection_name):
-            client.create_collection(
+            get_client().create_collection(
                 collection_name=collection_name,
                 vectors_config={
-                    "text": VectorParams(size=384, distance=Distance.COSINE),
-                    "image": VectorParams(size=768, distance=Distance.COSINE)
-                }
+                    "text": vector_params(TEXT_DIM, Distance.COSINE, profile),
+                    "image": vector_params(image_vector_size(collection_name), Distance.COSINE, profile)
+                },
+                quantization_config=quantization_config(profile),
+                hnsw_config=HnswConfigDiff(full_scan_threshold=FULL_SCAN_THRESHOLD_KB)
             )
+            forget_collection_profile(collection_name)
             print(f"Collection '{collection_name}' created.")
         else: 
             print(f"Collection '{collection_name}' already exists.")
+        create_payload_indexes(get_client(), collection_name, PAYLOAD_INDEXES)
     except Exception as e:
         print(f"Error creating collection: {e}")
 
-def embedding_image(image_path):
+def reducer_path(collection_name):
+    return os.path.join(REDUCER_DIR, f"{collection_name}_image.npz")
+
+def get_image_reducer(collection_name):
+    # fitted PCA/random projection saved for this collection, or None for full 768-d vectors
+    if collection_name not in image_reducers:
+        path = reducer_path(collection_name)
+        image_reducers[collection_name] = Reducer.load(path) if os.path.exists(path) else None
+    return image_reducers[collection_name]
+
+def image_vector_size(collection_name):
+    reducer = get_image_reducer(collection_name)
+    return reducer.dim if reducer is not None else IMAGE_DIM
+
+def reduce_image_embeddings(embeddings, collection_name):
+    reducer = get_image_reducer(collection_name)
+    if reducer is None:
+        return embeddings
+    return reducer.transform(embeddings)
+
+def fit_image_reducer(image_dir, collection_name, dim, kind="pca", sample_size=10_000, seed=0):
+    # fit before create_collection: the collection's "image" size follows the reducer
+    if kind == "pca":
+        image_files = get_image_file_name(image_dir) or []
+        rng = random.Random(seed)
+        sample = rng.sample(image_files, min(sample_size, len(image_files)))
+        embeddings, valid = embedding_images([os.path.join(image_dir, f) for f in sample])
+        reducer = Reducer.fit_pca(embeddings[valid], dim)
+        print(f"PCA {IMAGE_DIM} -> {dim} keeps {reducer.explained_variance:.1%} of the variance.")
+    elif kind == "random":
+        reducer = Reducer.fit_random(IMAGE_DIM, dim, seed=seed)
+    else:
+        raise ValueError(f"Unknown reducer kind '{kind}', expected 'pca' or 'random'")
+    reducer.save(reducer_path(collection_name))
+    image_reducers[collection_name] = reducer
+    return reducer
+
+@metrics.timed("model_forward")
+def embed_pixel_values(pixel_values):
+    # pixel_values: contiguous NCHW float32 batch from preprocess_image
+    return get_image_backend().embed(pixel_values)
+
+def load_image_or_cached(image_path):
+    # returns (cache key, cached vector or None, preprocessed pixels or None)
     try:
-        img = Image.open(image_path).convert('RGB')
-    except UnidentifiedImageError:
-        print(f"Cannot open image file: {image_path}")
+        with metrics.timer("hash"):
+            key = file_hash(image_path)
+    except OSError as e:
+        logg.warning("Cannot read image file", path=image_path, error=str(e))
+        return None, None, None
+    vector = get_image_cache().get(key)
+    if vector is not None:
+        return key, vector, None
+    with metrics.timer("decode"):
+        pixels, error = preprocess_image(image_path, **get_image_preprocess())
+    if error is not None:
+        logg.warning("Skipping image", **error)
+    return key, None, pixels
+
+def embedding_images(image_paths, batch_size=IMAGE_BATCH_SIZE):
+    # returns (embeddings, valid): one row per input path, valid[i] is False for unreadable files
+    embeddings = np.zeros((len(image_paths), IMAGE_DIM), dtype=np.float32)
+    valid = np.zeros(len(image_paths), dtype=bool)
+
+    keys = []
+    for image_path in image_paths:
+        try:
+            with metrics.timer("hash"):
+                keys.append(file_hash(image_path))
+        except OSError as e:
+            logg.warning("Cannot read image file", path=image_path, error=str(e))
+            keys.append(None)
+    cached, found = get_image_cache().get_many(keys)
+    embeddings[found] = cached[found]
+    valid[found] = True
+
+    pending = [row for row, key in enumerate(keys) if key is not None and not found[row]]
+    retried = False
+    while pending:
+        batches = preprocess_batches(
+            [image_paths[row] for row in pending],
+            batch_size,
+            executor=get_preprocess_pool(),
+            config=get_image_preprocess()
+        )
+        finished = 0  # leading pending rows already embedded or reported
+        try:
+            while True:
+                # time the model spends waiting on the decode pool
+                with metrics.timer("decode_wait"):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                batch_rows, pixel_values, errors = batch
+                finished += len(batch_rows) + len(errors)
+                for error in errors:
+                    logg.warning("Skipping image", **error)
+                if not batch_rows:
+                    continue
+                rows = [pending[row] for row in batch_rows]
+                embeddings[rows] = embed_pixel_values(pixel_values)
+                valid[rows] = True
+                get_image_cache().put_many([keys[row] for row in rows], embeddings[rows])
+        except BrokenProcessPool as e:
+            if retried:
+                raise
+            retried = True
+            restart_preprocess_pool(e)
+            pending = pending[finished:]
+            continue
+        break
+    return embeddings, valid
+
+def embedding_image(image_path):
+    embeddings, valid = embedding_images([image_path], batch_size=1)
+    if not valid[0]:
         return None
-    feature = extractor(images=img , return_tensors="pt")
-    with torch.no_grad():
-        outputs = model(**feature)
+    return embeddings[0]
 
-    embedding = outputs.last_hidden_state[:,0,:].numpy().flatten()
-    return embedding    
+@metrics.timed("text_encode")
+def encode_texts(texts, batch_size=TEXT_BATCH_SIZE):
+    return get_text_backend().encode(texts, batch_size=batch_size)
 
 def embedding_text(text):
     try:
-        embedding = text_model.encode(text)
+        embedding = encode_with_cache(get_text_cache(), [text], encode_texts)[0]
         return embedding
     except Exception as e:
         print(f"Error generating text embedding: {e}")
         return None
 
+def embedding_texts(texts, batch_size=TEXT_BATCH_SIZE):
+    # encodes each distinct string once (cache misses only, one batched call) and fans the rows back out
+    try:
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = encode_with_cache(
+            get_text_cache(),
+            unique_texts,
+            lambda batch: encode_texts(batch, batch_size=batch_size)
+        )
+        row_of = {text: row for row, text in enumerate(unique_texts)}
+        return vectors[[row_of[text] for text in texts]]
+    except Exception as e:
+        print(f"Error generating text embeddings: {e}")
+        return None
+
+def animal_text(animal):
+    return f"{animal.category} {animal.type_of_category} {animal.description}"
+
+def point_payload(image_path, file_name, category, description, type_of_category):
+    return {
+        "file_name": file_name,
+        "path": image_path,
+        "category": category,
+        "description": description,
+        "type_of_category": type_of_category
+    }
+
+def animal_columns(ids, image_paths, animals, image_embeddings, text_embeddings, valid=None):
+    # columnar batch for save_vectors_to_qdrant: rows where valid is False are dropped
+    # with one fancy-index per array, no per-point objects
+    rows = np.arange(len(ids)) if valid is None else np.flatnonzero(valid)
+    vectors = {
+        "image": np.asarray(image_embeddings, dtype=np.float32)[rows],
+        "text": np.asarray(text_embeddings, dtype=np.float32)[rows]
+    }
+    payloads = [
+        point_payload(image_paths[row], animals[row].name, animals[row].category, animals[row].description, animals[row].type_of_category)
+        for row in rows
+    ]
+    return [ids[row] for row in rows], vectors, payloads
+
 def get_points(
         id, 
         embedding_image,
@@ -82,16 +394,10 @@ def get_points(
         points = PointStruct(
             id=id,
             vector={
-                "image": embedding_image,
-                "text": embedding_text
+                "image": np.asarray(embedding_image, dtype=np.float32),
+                "text": np.asarray(embedding_text, dtype=np.float32)
             },
-            payload={
-                "file_name": file_name,
-                "path": image_path,
-                "category": category,
-                "description": description,
-                "type_of_category": type_of_category
-            }
+            payload=point_payload(image_path, file_name, category, description, type_of_category)
         )
         return points
     except Exception as e:
@@ -110,39 +416,173 @@ def save_image_to_qdrant(collection_name, points, image_path):
             else:
                 points_to_upsert = [points]  # Wrap single point in a list
                 
-            client.upsert(
-                collection_name=collection_name,
-                points=points_to_upsert
-            )
+            with metrics.timer("upsert"):
+                get_client().upsert(
+                    collection_name=collection_name,
+                    points=points_to_upsert
+                )
+            search_results.invalidate(collection_name)
             print(f"Image '{image_path}' saved to Qdrant.")
         else:
             print(f"Failed to save image '{image_path}' to Qdrant: points is None.")
     except Exception as e:
         print(f"Error saving image to Qdrant: {e}")
-            
-def search_image_by_query_user(user_query, collection_name, top_k=5):
+
+def save_vectors_to_qdrant(collection_name, ids, vectors, payloads, batch_size=UPSERT_BATCH_SIZE, parallel=UPSERT_PARALLEL, wait=False):
+    # columnar bulk upload: one float32 (n, dim) array per named vector plus id and
+    # payload sequences. The client slices the arrays per batch, so no PointStruct
+    # or Python float list is built per point on our side.
     try:
-        query_embedding = embedding_text(user_query)
-        results = client.search(
-            collection_name=collection_name,
-            query_vector=("text", query_embedding.tolist()),  # Convert to list and specify vector name
-            limit=top_k
-        )
-        return [(result.payload["file_name"], result.score) for result in results]
+        if not is_collection_exists(collection_name=collection_name):
+            create_collection(collection_name=collection_name)
+
+        vectors = {name: np.ascontiguousarray(array, dtype=np.float32) for name, array in vectors.items()}
+        # with result caching on, invalidate only once Qdrant has applied the points:
+        # a search between an unacknowledged write and its application would be cached for the whole TTL
+        wait = wait or search_results.enabled
+        start = time.perf_counter()
+        with metrics.timer("upsert"):
+            get_client().upload_collection(
+                collection_name=collection_name,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                batch_size=batch_size,
+                parallel=parallel,
+                wait=wait
+            )
+        search_results.invalidate(collection_name)
+        uploaded = len(ids)
+        elapsed = time.perf_counter() - start
+        rate = uploaded / elapsed if elapsed > 0 else 0.0
+        print(f"Uploaded {uploaded} points to '{collection_name}' in {elapsed:.2f}s ({rate:.1f} points/sec).")
+        logg.info("Uploaded points", collection=collection_name, points=uploaded, seconds=elapsed)
+        return uploaded
+    except Exception as e:
+        print(f"Error saving vectors to Qdrant: {e}")
+        return None
+
+def embedding_query(text):
+    # in-process LRU in front of embedding_text for repeated query strings
+    query_embedding = query_vectors.get(text)
+    if query_embedding is None:
+        query_embedding = embedding_text(text)
+        if query_embedding is not None:
+            query_vectors.put(text, query_embedding)
+    return query_embedding
+
+def cached_search(collection_name, vector_name, query_embedding, limit, query_filter=None):
+    key = ResultCache.key(collection_name, vector_name, query_embedding, query_filter, limit)
+    results = search_results.get(key)
+    if results is None:
+        generation = search_results.generation(collection_name)
+        with metrics.timer("search"):
+            hits = get_client().query_points(
+                collection_name=collection_name,
+                query=np.asarray(query_embedding, dtype=np.float32),
+                using=vector_name,
+                query_filter=query_filter,
+                search_params=collection_search_params(get_client(), collection_name),
+                limit=limit
+            ).points
+        results = [(hit.payload["file_name"], hit.score) for hit in hits]
+        search_results.put(key, results, generation)
+    return list(results)
+
+def search_image_by_query_user(user_query, collection_name, top_k=5, filters=None):
+    # filters: structured payload filter, e.g. {"type_of_category": "cat", "category": ["animal"]}
+    try:
+        query_embedding = embedding_query(user_query)
+        return cached_search(collection_name, "text", query_embedding, top_k, query_filter=build_filter(filters, PAYLOAD_INDEXES))
     except Exception as e:
         print(f"Error searching image by user query: {e}")
         return None
 
+def fusion_query(fusion="rrf", weights=None, prefetch_count=2):
+    # "rrf" (rank-based) and "dbsf" (score distribution) are Qdrant's built-in fusions;
+    # "weighted" sums weight * score per prefetch, a point missing from one counts as 0 there
+    if fusion == "rrf":
+        return FusionQuery(fusion=Fusion.RRF)
+    if fusion == "dbsf":
+        return FusionQuery(fusion=Fusion.DBSF)
+    if fusion == "weighted":
+        weights = list(weights) if weights is not None else [1.0] * prefetch_count
+        if len(weights) != prefetch_count:
+            raise ValueError(f"weighted fusion needs {prefetch_count} weights, got {len(weights)}")
+        return FormulaQuery(
+            formula=SumExpression(sum=[MultExpression(mult=[float(weight), f"$score[{i}]"]) for i, weight in enumerate(weights)]),
+            defaults={f"$score[{i}]": 0.0 for i in range(prefetch_count)}
+        )
+    raise ValueError(f"Unknown fusion '{fusion}', expected 'rrf', 'dbsf' or 'weighted'")
+
+def hybrid_search(collection_name, user_query=None, image_path=None, top_k=5, fusion="rrf", weights=None,
+                  prefetch_limit=HYBRID_PREFETCH_LIMIT, group_by=None, query_filter=None):
+    # text and/or image query in one round trip: a prefetch per named vector, fused by Qdrant.
+    # weights follow prefetch order (text first). group_by="path" keeps the best hit per file.
+    try:
+        params = collection_search_params(get_client(), collection_name)
+        prefetch = []
+        vectors = []
+        if user_query:
+            text_embedding = embedding_query(user_query)
+            if text_embedding is None:
+                return None
+            vectors.append(text_embedding)
+            prefetch.append(Prefetch(query=text_embedding, using="text", limit=prefetch_limit, params=params))
+        image_id = stored_point_id(collection_name, image_path) if image_path else None
+        if image_id is not None:
+            # already indexed: let Qdrant use the stored image vector
+            prefetch.append(Prefetch(query=image_id, using="image", limit=prefetch_limit, params=params))
+        elif image_path:
+            image_embedding = embedding_image(image_path)
+            if image_embedding is None:
+                return None
+            image_embedding = reduce_image_embeddings(image_embedding[None], collection_name)[0]
+            vectors.append(image_embedding)
+            prefetch.append(Prefetch(query=image_embedding, using="image", limit=prefetch_limit, params=params))
+        if not prefetch:
+            raise ValueError("hybrid_search needs a user_query and/or an image_path")
+        query = fusion_query(fusion, weights, prefetch_count=len(prefetch))
+
+        mode = f"hybrid:{fusion}:{weights}:{prefetch_limit}:{group_by}:{'text' if user_query else ''}+{image_id or ('image' if image_path else '')}"
+        key = ResultCache.key(collection_name, mode, np.concatenate(vectors) if vectors else np.zeros(0), query_filter, top_k)
+        results = search_results.get(key)
+        if results is None:
+            generation = search_results.generation(collection_name)
+            with metrics.timer("hybrid_search"):
+                if group_by:
+                    response = get_client().query_points_groups(
+                        collection_name=collection_name,
+                        group_by=group_by,
+                        prefetch=prefetch,
+                        query=query,
+                        query_filter=query_filter,
+                        limit=top_k,
+                        group_size=1
+                    )
+                    hits = [group.hits[0] for group in response.groups]
+                else:
+                    hits = get_client().query_points(
+                        collection_name=collection_name,
+                        prefetch=prefetch,
+                        query=query,
+                        query_filter=query_filter,
+                        limit=top_k
+                    ).points
+            results = [(hit.payload["file_name"], hit.score) for hit in hits]
+            search_results.put(key, results, generation)
+        return list(results)
+    except Exception as e:
+        print(f"Error in hybrid search: {e}")
+        return None
+
 def search_image_by_text_payload(category, description, type_of_category, colletion_name, top_k=5):
+    # category/type_of_category are exact payload filters (index lookups); only the
+    # free-text description is embedded and ranked on the "text" vector
     try:
-        full_text = f"{category} {description} {type_of_category}"
-        query_embedding = embedding_text(full_text)
-        results = client.search(
-            collection_name=colletion_name,
-            query_vector=("text", query_embedding.tolist()),  # Convert to list and specify vector name
-            limit=top_k,
-        )
-        return [(result.payload["file_name"], result.score) for result in results]
+        query_filter = build_filter({"category": category, "type_of_category": type_of_category}, PAYLOAD_INDEXES)
+        query_embedding = embedding_query(description)
+        return cached_search(colletion_name, "text", query_embedding, top_k, query_filter=query_filter)
     except Exception as e:
         print(f"Error searching image by text: {e}")
         return None
@@ -151,39 +591,22 @@ def create_points(image_dir , animal):
     try:
         image_dir = f"{image_dir}"
         image_files = [f for f in os.listdir(image_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-        points = []
-        for i, image_file in enumerate(image_files):
-            image_path = os.path.join(image_dir, image_file)
-            embedding_image = embedding_image(image_path)
-            embedding_text = embedding_text(f"{animal.category} {animal.type_of_category} {animal.description}")
-            points.append(
-                get_points(
-                    id=i,
-                    embedding_image=embedding_image,
-                    embedding_text=embedding_text,
-                    image_path=image_path,
-                    file_name=image_file,
-                    category=f"{animal.category}",
-                    description=f"{animal.description}",
-                    type_of_category=f"{animal.type_of_category}"
-                )
-            )
-        return points
+        image_paths = [os.path.join(image_dir, image_file) for image_file in image_files]
+        image_embeddings, valid = embedding_images(image_paths)
+        image_embeddings = reduce_image_embeddings(image_embeddings, "advanced_image_search")
+        text_embedding = embedding_text(animal_text(animal))
+        # every file shares the animal's text vector: a broadcast view, not n copies
+        text_embeddings = np.broadcast_to(text_embedding, (len(image_files), len(text_embedding)))
+        animals = [Animal(image_file, f"{animal.category}", f"{animal.description}", f"{animal.type_of_category}") for image_file in image_files]
+        return animal_columns([point_id_for(path) for path in image_paths], image_paths, animals, image_embeddings, text_embeddings, valid)
     except Exception as e:
         print(f"Error creating datasets: {e}")
         return None
 
-def create_images(points):
-    try:
-        for point in points:
-            save_image_to_qdrant(
-                collection_name="advanced_image_search",
-                points=point,
-                image_path=point.payload["path"]
-            )
-    except Exception as e:
-        print(f"Error creating images: {e}")
-        return None
+def create_images(columns):
+    # columns: (ids, vectors, payloads) from create_points
+    ids, vectors, payloads = columns
+    return save_vectors_to_qdrant("advanced_image_search", ids, vectors, payloads)
 
 def create_class_animal_data():
     animals = []
@@ -231,41 +654,321 @@ def create_upsert():
         print("No animals data available.")
         return None
     
-    # create points
-    points = []
-    file_names = get_image_file_name("images/cats")
-    for i , animal in enumerate(animals , start=0 ) :
-        points.append(get_points(
-            id = i,
-            embedding_image=embedding_image(f"images/cats/{animal.name}"),
-            embedding_text=embedding_text(f"{animal.category} {animal.type_of_category} {animal.description}"),
-            image_path=f"images/cats/{animal.name}",
-            file_name=file_names[i],
-            category=animal.category,
-            description=animal.description,
-            type_of_category=animal.type_of_category    
-        ))
-        
-    # save points to qdrant
-    for i, point in enumerate(points, start=0):  # Properly unpack enumerate
-        if point is not None:  # Add null check
-            save_image_to_qdrant(
-                collection_name="advanced_image_search",
-                points=point,
-                image_path=f"images/cats/{file_names[i]}"
+    # embed (skipping near-duplicates when DEDUP_MODE is on) and save points to qdrant
+    try:
+        ids, _ = ingest_paths("advanced_image_search", [(f"images/cats/{animal.name}", animal.description) for animal in animals], wait=False, parallel=UPSERT_PARALLEL)
+        return ids
+    except Exception as e:
+        print(f"Error upserting images: {e}")
+        return None
+
+def is_image_entry(entry):
+    return entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg', '.png'))
+
+def iter_animal_data(image_dir):
+    # lazy counterpart of create_class_animal_data: yields entries as scandir finds them.
+    # cat_description() follows the sorted file names, not scandir order, and only the
+    # first len(descriptions) names get one: a bounded heap picks those in one streaming
+    # pass, so memory doesn't grow with the directory
+    descriptions = cat_description()
+    with os.scandir(image_dir) as entries:
+        names = heapq.nsmallest(len(descriptions), (entry.name for entry in entries if is_image_entry(entry)))
+    descriptions = dict(zip(names, descriptions))
+    with os.scandir(image_dir) as entries:
+        index = 0
+        for entry in entries:
+            if not is_image_entry(entry):
+                continue
+            yield index, Animal(entry.name, "animal", descriptions.get(entry.name, "This is a cat."), "cat")
+            index += 1
+
+def create_upsert_streaming(image_dir="images/cats", collection_name="advanced_image_search", batch_size=IMAGE_BATCH_SIZE):
+    # decode (thread pool) -> embed (batched, this thread) -> upsert (async client thread),
+    # every stage bounded so memory stays flat regardless of directory size
+    create_collection(collection_name)
+    uploader = AsyncUploader(
+        collection_name,
+        host=QDRANT_HOST,
+        port=QDRANT_PORT,
+        wait=search_results.enabled,  # see save_vectors_to_qdrant
+        on_upload=lambda count: search_results.invalidate(collection_name)
+    ).start()
+    start = time.perf_counter()
+    try:
+        decoded = decode_images(
+            iter_animal_data(image_dir),
+            load=lambda item: load_image_or_cached(os.path.join(image_dir, item[1].name)),
+            workers=DECODE_WORKERS,
+            max_pending=batch_size * 2
+        )
+        for batch in batched(decoded, batch_size):
+            batch = [(item, key, vector, img) for item, (key, vector, img) in batch if vector is not None or img is not None]
+            if not batch:
+                continue
+            image_embeddings = [vector for _, _, vector, _ in batch]
+            to_embed = [row for row, vector in enumerate(image_embeddings) if vector is None]
+            if to_embed:
+                new_vectors = embed_pixel_values(np.stack([batch[row][3] for row in to_embed]))
+                for row, vector in zip(to_embed, new_vectors):
+                    image_embeddings[row] = vector
+                get_image_cache().put_many([batch[row][1] for row in to_embed], new_vectors)
+            image_embeddings = reduce_image_embeddings(np.stack(image_embeddings), collection_name)
+            text_embeddings = embedding_texts([animal_text(animal) for (_, animal), _, _, _ in batch])
+            if text_embeddings is None:
+                continue
+            animals = [animal for (_, animal), _, _, _ in batch]
+            image_paths = [os.path.join(image_dir, animal.name) for animal in animals]
+            columns = animal_columns([point_id_for(path) for path in image_paths], image_paths, animals, image_embeddings, text_embeddings)
+            # blocks while the uploader is saturated, so this shows network backpressure
+            with metrics.timer("upsert_wait"):
+                uploader.put(columns)
+    except Exception as e:
+        print(f"Error in streaming upsert: {e}")
+    finally:
+        uploaded = uploader.close()
+        search_results.invalidate(collection_name)
+    elapsed = time.perf_counter() - start
+    rate = uploaded / elapsed if elapsed > 0 else 0.0
+    print(f"Streamed {uploaded} points to '{collection_name}' in {elapsed:.2f}s ({rate:.1f} points/sec), {uploader.failed} failed.")
+    return uploaded
+
+def phash_index_path(collection_name):
+    return os.path.join(PHASH_DIR, f"{collection_name}_{PHASH_KIND}.hashes")
+
+def get_phash_index(collection_name):
+    # perceptual hash -> point id for every image ingested with dedup on
+    if collection_name not in phash_indexes:
+        phash_indexes[collection_name] = HashIndex.load(phash_index_path(collection_name), PHASH_MAX_DISTANCE)
+    return phash_indexes[collection_name]
+
+def find_near_duplicates(collection_name, image_paths, ids):
+    # returns (hashes, {row: point id of the image it duplicates}). Each row is looked
+    # up in the index once; rows matching nothing there can still match an earlier row
+    # of the same chunk, measured with one pairwise distance matrix. The index itself
+    # is only updated by ingest_paths once the chunk is uploaded.
+    with metrics.timer("phash"):
+        try:
+            hashes = list(get_preprocess_pool().map(partial(image_hash, kind=PHASH_KIND), image_paths))
+        except BrokenProcessPool as e:
+            restart_preprocess_pool(e)
+            hashes = list(get_preprocess_pool().map(partial(image_hash, kind=PHASH_KIND), image_paths))
+    index = get_phash_index(collection_name)
+    rows = [row for row, value in enumerate(hashes) if value is not None]  # unreadable ones are reported by embedding_images
+    chunk = np.array([hashes[row] for row in rows], dtype=np.uint64)
+    distances = popcount(chunk[:, None] ^ chunk[None, :])
+    originals = []  # positions (in rows) of chunk rows that matched nothing
+    duplicates = {}
+    with metrics.timer("phash_lookup"):
+        for position, row in enumerate(rows):
+            match = index.nearest(hashes[row], PHASH_MAX_DISTANCE)
+            if match is None and originals:
+                near = distances[position, originals]
+                best = int(np.argmin(near))
+                if near[best] <= PHASH_MAX_DISTANCE:
+                    match = (int(near[best]), ids[rows[originals[best]]])
+            if match is None:
+                originals.append(position)
+            elif match[1] != ids[row]:
+                duplicates[row] = match[1]
+    return hashes, duplicates
+
+def ingest_paths(collection_name, items, wait=True, dedup=None, parallel=1):
+    # embeds and upserts one chunk of (image_path, description) pairs, raising on
+    # failure so callers (sharded_ingest.py) can retry it. Returns (uploaded ids, unreadable paths).
+    # parallel: upload workers; 1 for callers that already run one ingest per process
+    # With dedup ("alias" / "reuse", default DEDUP_MODE) near-duplicates of stored
+    # images skip the image model, see DEDUP_MODE.
+    dedup = dedup or DEDUP_MODE
+    wait = wait or search_results.enabled  # see save_vectors_to_qdrant
+    image_paths = [path for path, _ in items]
+    animals = [Animal(os.path.basename(path), "animal", description, "cat") for path, description in items]
+    ids = [point_id_for(path) for path in image_paths]
+    hashes, duplicates = find_near_duplicates(collection_name, image_paths, ids) if dedup != "off" else ([], {})
+
+    # originals from earlier chunks must still exist; otherwise the row is embedded as usual.
+    # Points the hash index knows may already carry aliases, which the upsert must keep
+    chunk_rows = {ids[row]: row for row in range(len(items)) if row not in duplicates}
+    stored = {}
+    earlier = list({original for original in duplicates.values() if original not in chunk_rows})
+    index = get_phash_index(collection_name)
+    known = [point_id for point_id in chunk_rows if point_id in index]
+    if earlier or known:
+        records = get_client().retrieve(
+            collection_name=collection_name,
+            ids=earlier + known,
+            with_payload=["aliases"],
+            with_vectors=["image"] if dedup == "reuse" else False
+        )
+        stored = {str(record.id): record for record in records}
+    duplicates = {row: original for row, original in duplicates.items() if original in chunk_rows or original in stored}
+
+    rows = [row for row in range(len(items)) if row not in duplicates]
+    image_embeddings = np.zeros((len(items), image_vector_size(collection_name)), dtype=np.float32)
+    valid = np.zeros(len(items), dtype=bool)
+    if rows:
+        embeddings, embedded = embedding_images([image_paths[row] for row in rows])
+        image_embeddings[rows] = reduce_image_embeddings(embeddings, collection_name)
+        valid[rows] = embedded
+    unreadable = [image_paths[row] for row in rows if not valid[row]]
+    # a duplicate of a chunk row that failed to decode has nothing to point at
+    duplicates = {row: original for row, original in duplicates.items() if original in stored or valid[chunk_rows[original]]}
+
+    aliases = {}
+    for row, original in duplicates.items():
+        if dedup == "reuse":
+            image_embeddings[row] = stored[original].vector["image"] if original in stored else image_embeddings[chunk_rows[original]]
+            valid[row] = True
+        else:
+            aliases.setdefault(original, []).append(image_paths[row])
+
+    text_embeddings = embedding_texts([animal_text(animal) for animal in animals])
+    if text_embeddings is None:
+        raise RuntimeError("text embedding failed")
+    ids, vectors, payloads = animal_columns(ids, image_paths, animals, image_embeddings, text_embeddings, valid)
+    for point_id, payload in zip(ids, payloads):
+        if point_id in stored and (stored[point_id].payload or {}).get("aliases"):
+            payload["aliases"] = stored[point_id].payload["aliases"]
+    if ids and save_vectors_to_qdrant(collection_name, ids, vectors, payloads, parallel=parallel, wait=wait) is None:
+        raise RuntimeError(f"upload of {len(ids)} points failed")
+
+    for original, paths in aliases.items():
+        existing = (stored[original].payload or {}).get("aliases", []) if original in stored else []
+        get_client().set_payload(
+            collection_name=collection_name,
+            payload={"aliases": list(dict.fromkeys(existing + paths))},
+            points=[original],
+            wait=wait
+        )
+    if dedup != "off":
+        # no-op for points the index already holds under the same hash; save() only appends the new ones
+        for row in rows:
+            if valid[row] and hashes[row] is not None:
+                index.add(hashes[row], point_id_for(image_paths[row]))
+        index.save(phash_index_path(collection_name))
+        if duplicates:
+            search_results.invalidate(collection_name)
+            print(f"{len(duplicates)} near-duplicate images {'aliased' if dedup == 'alias' else 'reused'} without running the image model.")
+            logg.info("Near-duplicates", collection=collection_name, mode=dedup, count=len(duplicates))
+    return ids, unreadable
+
+def sync_images(image_dir="images/cats", collection_name="advanced_image_search", manifest_path=None):
+    # incremental re-index: embed/upsert only new or changed files, delete points of removed files
+    create_collection(collection_name)
+    manifest_path = manifest_path or os.path.join(MANIFEST_DIR, f"{collection_name}.json")
+    manifest = load_manifest(manifest_path)
+    changed, removed = scan_changes(image_dir, manifest)
+    print(f"Sync '{image_dir}': {len(changed)} new or changed, {len(removed)} removed.")
+
+    if removed:
+        try:
+            get_client().delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=[entry["id"] for entry in removed.values()])
             )
-    
+            search_results.invalidate(collection_name)
+            for path in removed:
+                del manifest[path]
+        except Exception as e:
+            print(f"Error deleting removed images from Qdrant: {e}")
+
+    file_names = get_image_file_name(image_dir) or []
+    descriptions = dict(zip(file_names, cat_description()))
+    synced = 0
+    for batch in batched(changed, IMAGE_BATCH_SIZE):
+        for path, entry in batch:
+            entry.setdefault("description", descriptions.get(os.path.basename(path), "This is a cat."))
+        animals = [Animal(os.path.basename(path), "animal", entry["description"], "cat") for path, entry in batch]
+        image_embeddings, valid = embedding_images([path for path, _ in batch])
+        image_embeddings = reduce_image_embeddings(image_embeddings, collection_name)
+        text_embeddings = embedding_texts([animal_text(animal) for animal in animals])
+        if text_embeddings is None:
+            continue
+        ids, vectors, payloads = animal_columns([entry["id"] for _, entry in batch], [path for path, _ in batch], animals, image_embeddings, text_embeddings, valid)
+        if save_vectors_to_qdrant(collection_name, ids, vectors, payloads) is None:
+            continue
+        for row, (path, entry) in enumerate(batch):
+            if valid[row]:
+                manifest[path] = entry
+                synced += 1
+        save_manifest(manifest_path, manifest)
+
+    save_manifest(manifest_path, manifest)
+    print(f"Sync '{image_dir}' done: {synced} upserted, {len(removed)} removed.")
+    return synced
+
+def stored_point_id(collection_name, image_path):
+    # id of image_path's point if it was ingested under this (normalized) path, else None
+    point_id = point_id_for(image_path)
+    try:
+        found = get_client().retrieve(collection_name=collection_name, ids=[point_id], with_payload=False, with_vectors=False)
+    except Exception as e:
+        print(f"Error looking up point for {image_path}: {e}")
+        return None
+    return point_id if found else None
+
+def recommend_images(collection_name, positive, negative=None, top_k=5, using="image", strategy="average_vector", query_filter=None):
+    # "more like these, less like those" from stored vectors: point ids in, no model
+    # forward pass. The query points themselves are not returned.
+    # strategy: "average_vector", "best_score" or "sum_scores" (Qdrant RecommendStrategy)
+    try:
+        positive = [positive] if isinstance(positive, (str, int)) else list(positive)
+        negative = list(negative or [])
+        if not positive and not negative:
+            raise ValueError("recommend_images needs at least one positive or negative id")
+        mode = f"{using}:ids:{positive}:{negative}:{strategy}"
+        key = ResultCache.key(collection_name, mode, np.zeros(0), query_filter, top_k)
+        results = search_results.get(key)
+        if results is None:
+            generation = search_results.generation(collection_name)
+            if len(positive) == 1 and not negative:
+                query = positive[0]  # plain nearest neighbours of a stored point
+            else:
+                query = RecommendQuery(recommend=RecommendInput(positive=positive, negative=negative, strategy=RecommendStrategy(strategy)))
+            with metrics.timer("recommend"):
+                hits = get_client().query_points(
+                    collection_name=collection_name,
+                    query=query,
+                    using=using,
+                    query_filter=query_filter,
+                    search_params=collection_search_params(get_client(), collection_name),
+                    limit=top_k
+                ).points
+            results = [(hit.payload["file_name"], hit.score) for hit in hits]
+            search_results.put(key, results, generation)
+        return list(results)
+    except Exception as e:
+        print(f"Error recommending images: {e}")
+        return None
+
+def recommend_images_by_path(collection_name, positive_paths, negative_paths=None, top_k=5, using="image", strategy="average_vector"):
+    # same as recommend_images, for files ingested under these paths
+    return recommend_images(
+        collection_name,
+        [point_id_for(path) for path in positive_paths],
+        [point_id_for(path) for path in negative_paths or []],
+        top_k=top_k,
+        using=using,
+        strategy=strategy
+    )
+
 def find_similar_images( query_image_path , top_key = 5 ):
+    # files already in the collection are answered from their stored vector
+    point_id = stored_point_id("advanced_image_search", query_image_path)
+    if point_id is not None:
+        return recommend_images("advanced_image_search", point_id, top_k=top_key)
     query_embedding = embedding_image(query_image_path)
-    results = client.search(
-        collection_name="advanced_image_search",
-        query_vector=("image", query_embedding.tolist()),  # Convert to list and specify vector name
-        limit = top_key
-    )
-    return [(result.payload["file_name"], result.score) for result in results]
+    if query_embedding is None:
+        return None
+    query_embedding = reduce_image_embeddings(query_embedding[None], "advanced_image_search")[0]
+    return cached_search("advanced_image_search", "image", query_embedding, top_key)
 
 
 def main():
+    if os.environ.get("METRICS_PORT"):
+        metrics.serve_prometheus(port=int(os.environ["METRICS_PORT"]))
+    if os.environ.get("METRICS_SNAPSHOT"):
+        metrics.start_snapshots(os.environ["METRICS_SNAPSHOT"])
+
     create_upsert()
 
     user_query = "who me black cat "
@@ -305,9 +1008,18 @@ def main():
     res_image_search  =  find_similar_images('x.jpg')
     print("imageeeee search : ", res_image_search)
 
+    # text + image in one request, fused server-side, one hit per file
+    res_hybrid = hybrid_search("advanced_image_search", user_query=user_query, image_path='x.jpg', group_by="path")
+    print("hybrid search : ", res_hybrid)
+
+    if os.environ.get("METRICS_SNAPSHOT"):
+        metrics.write_snapshot(os.environ["METRICS_SNAPSHOT"])
+
 
 
 if __name__ == "__main__":
+    if "--preload" in sys.argv:
+        warm_up()
     main()
 
 
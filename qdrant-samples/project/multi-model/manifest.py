@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from embedding_cache import file_hash
+
+
+def point_id_for(image_path):
+    # stable across runs and independent of directory order
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, os.path.normpath(image_path)))
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(manifest_path, manifest):
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def scan_changes(image_dir, manifest):
+    # returns (changed, removed): changed is a sorted list of (path, entry) for new or
+    # modified files, removed maps path -> old entry for files that disappeared.
+    # mtime+size decide whether a file needs hashing at all.
+    changed = []
+    seen = set()
+    with os.scandir(image_dir) as entries:
+        files = sorted(
+            (entry for entry in entries if entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg', '.png'))),
+            key=lambda entry: entry.name
+        )
+    for dir_entry in files:
+        path = os.path.normpath(os.path.join(image_dir, dir_entry.name))
+        seen.add(path)
+        stat = dir_entry.stat()
+        old = manifest.get(path)
+        if old is not None and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size:
+            continue
+        try:
+            digest = file_hash(path)
+        except OSError as e:
+            print(f"Cannot read image file: {path} ({e})")
+            continue
+        if old is not None and old["hash"] == digest:
+            old["mtime"] = stat.st_mtime
+            old["size"] = stat.st_size
+            continue
+        entry = dict(old or {})
+        entry.update({
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "hash": digest,
+            "id": point_id_for(path)
+        })
+        changed.append((path, entry))
+
+    removed = {path: entry for path, entry in manifest.items() if path not in seen}
+    return changed, removed
@@ -0,0 +1,61 @@
+from functools import partial
+
+import numpy as np
+from PIL import Image , UnidentifiedImageError
+
+from streaming import batched , decode_images
+
+# Kept free of model imports so process-pool workers stay light.
+
+
+def preprocess_config(extractor):
+    size = extractor.size
+    if isinstance(size, dict):
+        size = size.get("height") or size.get("shortest_edge")
+    return {
+        "size": int(size),
+        "mean": tuple(extractor.image_mean),
+        "std": tuple(extractor.image_std)
+    }
+
+def preprocess_image(image_path, size=224, mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)):
+    # returns (pixels, None) with pixels a CHW float32 array, or (None, error record)
+    try:
+        with Image.open(image_path) as img:
+            # JPEG only: let the decoder downscale by 1/2, 1/4 or 1/8 while staying >= size
+            img.draft("RGB", (size, size))
+            img = img.convert("RGB").resize((size, size), Image.BILINEAR)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        return None, {
+            "path": image_path,
+            "stage": "decode",
+            "error": type(e).__name__,
+            "reason": str(e)  # not "message": these records are logged as **fields
+        }
+    pixels = np.asarray(img, dtype=np.float32) * (1.0 / 255.0)
+    pixels = (pixels - np.asarray(mean, dtype=np.float32)) / np.asarray(std, dtype=np.float32)
+    return pixels.transpose(2, 0, 1), None
+
+def preprocess_batches(image_paths, batch_size, executor, config, max_pending=None):
+    # yields (rows, pixel_values, errors): rows index into image_paths, pixel_values is a
+    # contiguous NCHW float32 batch ready for the model, errors are the skipped files
+    results = decode_images(
+        image_paths,
+        load=partial(preprocess_image, **config),
+        max_pending=max_pending or batch_size * 2,
+        executor=executor
+    )
+    row = 0
+    for batch in batched(results, batch_size):
+        rows = []
+        pixels = []
+        errors = []
+        for _, (pixel_values, error) in batch:
+            if error is not None:
+                errors.append(error)
+            else:
+                rows.append(row)
+                pixels.append(pixel_values)
+            row += 1
+        pixel_values = np.stack(pixels) if pixels else np.empty((0, 3, config["size"], config["size"]), dtype=np.float32)
+        yield rows, pixel_values, errors
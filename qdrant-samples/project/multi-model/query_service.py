@@ -0,0 +1,157 @@
+import asyncio
+import sys
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import QueryRequest
+
+from main import PAYLOAD_INDEXES , QDRANT_HOST , QDRANT_PORT , embedding_images , embedding_texts , reduce_image_embeddings , warm_up
+from manifest import point_id_for
+from payload_indexes import build_filter
+from storage_profiles import profile_of , search_params
+
+
+class MicroBatcher:
+    # Collects concurrent submit() calls for up to `window` seconds (or until
+    # max_batch_size items are waiting) and hands them to `process` as one list.
+    def __init__(self, process, max_batch_size=64, window=0.003):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.pending = []
+        self.flush_handle = None
+        self.tasks = set()  # the loop keeps only weak references to running tasks
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self.process([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+class QueryService:
+    def __init__(self, collection_name="advanced_image_search", host=QDRANT_HOST, port=QDRANT_PORT, max_batch_size=64, window=0.003):
+        self.collection_name = collection_name
+        self.client = AsyncQdrantClient(host, port=port)
+        self.profile = None
+        self.text_batcher = MicroBatcher(self._search_texts, max_batch_size=max_batch_size, window=window)
+        self.image_batcher = MicroBatcher(self._search_images, max_batch_size=max_batch_size, window=window)
+
+    async def close(self):
+        await self.client.close()
+
+    async def search_image_by_query_user(self, user_query, top_k=5):
+        return await self.text_batcher.submit((user_query, top_k, None))
+
+    async def search_image_by_text_payload(self, category, description, type_of_category, top_k=5):
+        # same as main.search_image_by_text_payload: exact filters on the indexed
+        # category/type fields, only the description is embedded
+        query_filter = build_filter({"category": category, "type_of_category": type_of_category}, PAYLOAD_INDEXES)
+        return await self.text_batcher.submit((description, top_k, query_filter))
+
+    async def find_similar_images(self, query_image_path, top_k=5):
+        return await self.image_batcher.submit((query_image_path, top_k))
+
+    async def _search_texts(self, items):
+        # model calls run in a worker thread so the event loop keeps accepting queries
+        vectors = await asyncio.to_thread(embedding_texts, [text for text, _, _ in items])
+        if vectors is None:
+            raise RuntimeError("text embedding failed")
+        return await self._search_batch("text", vectors, [top_k for _, top_k, _ in items], [query_filter for _, _, query_filter in items])
+
+    async def _search_images(self, items):
+        # files already in the collection are queried by their point id, as in
+        # main.find_similar_images; only the others are read and embedded
+        point_ids = [point_id_for(path) for path, _ in items]
+        stored = await self._stored_ids(point_ids)
+        queries = [point_id if point_id in stored else None for point_id in point_ids]
+        to_embed = [row for row, query in enumerate(queries) if query is None]
+        if to_embed:
+            vectors, valid = await asyncio.to_thread(embedding_images, [items[row][0] for row in to_embed])
+            if valid.any():
+                reduced = reduce_image_embeddings(vectors[valid], self.collection_name)
+                for row, vector in zip([row for row, ok in zip(to_embed, valid) if ok], reduced):
+                    queries[row] = vector
+        rows = [row for row, query in enumerate(queries) if query is not None]
+        results = [None] * len(items)
+        if rows:
+            found = await self._search_batch("image", [queries[row] for row in rows], [items[row][1] for row in rows])
+            for row, result in zip(rows, found):
+                results[row] = result
+        return results
+
+    async def _stored_ids(self, point_ids):
+        try:
+            records = await self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(dict.fromkeys(point_ids)),
+                with_payload=False,
+                with_vectors=False
+            )
+        except Exception as e:
+            print(f"Error looking up stored images: {e}")
+            return set()
+        return {str(record.id) for record in records}
+
+    async def _search_params(self):
+        # from the collection's own storage profile, read on first use
+        if self.profile is None:
+            self.profile = profile_of(await self.client.get_collection(self.collection_name))
+        return search_params(self.profile)
+
+    async def _search_batch(self, vector_name, queries, limits, filters=None):
+        # queries: vectors, or ids of stored points (searched with their stored vector, themselves excluded)
+        params = await self._search_params()
+        requests = [
+            QueryRequest(query=query, using=vector_name, filter=query_filter, limit=limit, params=params, with_payload=True)
+            for query, limit, query_filter in zip(queries, limits, filters or [None] * len(limits))
+        ]
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=requests
+        )
+        return [[(point.payload["file_name"], point.score) for point in response.points] for response in responses]
+
+
+async def main():
+    service = QueryService()
+    try:
+        queries = ["who me black cat ", "white cat on pillow", "gray cat with yellow eyes", "scary black cat"]
+        results = await asyncio.gather(*(service.search_image_by_query_user(query) for query in queries))
+        for query, result in zip(queries, results):
+            print(f"Search results for query '{query}':")
+            for file_name, score in result:
+                print(f"File: {file_name}, Score: {score}")
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    if "--preload" in sys.argv:
+        # load both models before the first request instead of inside it
+        warm_up()
+    asyncio.run(main())
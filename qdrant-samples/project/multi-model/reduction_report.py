@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+import main
+from dim_reduction import Reducer , recall_at_k
+
+# recall@k of reduced image vectors against exact search on the full 768-d ViT
+# vectors, for each target dimension. --fit persists a reducer for a collection
+# so main.py applies it at ingest and in find_similar_images.
+#
+#   python reduction_report.py --image-dir images/cats --dims 64 128 256
+#   python reduction_report.py --fit 128 --kind pca
+
+
+def run(args):
+    image_files = main.get_image_file_name(args.image_dir) or []
+    rng = np.random.default_rng(args.seed)
+    picks = rng.permutation(len(image_files))[:args.sample]
+    embeddings, valid = main.embedding_images([os.path.join(args.image_dir, image_files[i]) for i in picks])
+    embeddings = embeddings[valid]
+    if len(embeddings) == 0:
+        print(f"No readable images in '{args.image_dir}'.")
+        return None
+
+    # held-out queries: fit on the rest so PCA is not scored on its own training rows
+    n_queries = min(args.queries, max(1, len(embeddings) // 5))
+    queries, base = embeddings[:n_queries], embeddings[n_queries:]
+    report = {}
+    print(f"{'kind':<8} {'dim':>5} {'recall@' + str(args.top_k):>10} {'variance':>9}")
+    for kind in args.kinds:
+        for dim in args.dims:
+            try:
+                if kind == "pca":
+                    reducer = Reducer.fit_pca(base, dim)
+                else:
+                    reducer = Reducer.fit_random(embeddings.shape[1], dim, seed=args.seed)
+            except ValueError as e:
+                print(f"{kind:<8} {dim:>5} skipped: {e}")
+                continue
+            recall = recall_at_k(base, queries, reducer, k=args.top_k)
+            report.setdefault(kind, {})[dim] = {"recall_at_k": recall, "explained_variance": reducer.explained_variance}
+            variance = "-" if reducer.explained_variance is None else f"{reducer.explained_variance:.1%}"
+            print(f"{kind:<8} {dim:>5} {recall:>10.4f} {variance:>9}")
+
+    if args.fit:
+        reducer = main.fit_image_reducer(args.image_dir, args.collection, args.fit, kind=args.kind, sample_size=args.sample, seed=args.seed)
+        print(f"Saved {reducer.kind} reducer {reducer.input_dim} -> {reducer.dim} to {main.reducer_path(args.collection)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report recall@k for reduced image vector dimensions.")
+    parser.add_argument("--image-dir", default="images/cats")
+    parser.add_argument("--sample", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 192, 256, 384])
+    parser.add_argument("--kinds", nargs="+", default=["pca", "random"], choices=["pca", "random"])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--fit", type=int, default=0, help="fit and save a reducer of this dimension for --collection")
+    parser.add_argument("--kind", default="pca", choices=["pca", "random"])
+    parser.add_argument("--collection", default="advanced_image_search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,220 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from embedding_cache import CACHE_DIR , EmbeddingCache
+from help import cat_description
+
+# Sharded ingestion: the file list is split by a stable hash of the path across
+# N worker processes. Each worker loads its own model copy with
+# cpu_count // N intra-op threads, keeps its own embedding cache shard (workers
+# never wait on each other's cache lock, and a stable path -> shard mapping
+# keeps re-runs hitting it), and upserts straight to Qdrant. The coordinator hands
+# out chunks, reports progress, retries failed chunks, restarts crashed workers,
+# and finally checks that every uploaded id is in the collection.
+#
+#   python sharded_ingest.py --image-dir images/cats --workers 16
+
+CHUNK_SIZE = 256
+MAX_RETRIES = 3
+PROGRESS_INTERVAL = 5.0
+VERIFY_BATCH_SIZE = 1000
+
+
+def shard_of(path, shards):
+    return zlib.crc32(os.path.normpath(path).encode("utf-8")) % shards
+
+def worker(shard, shards, threads, collection_name, tasks, results, dedup="off"):
+    # own model instance per process; the env vars must be set before torch loads
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    cache_dir = os.path.join(CACHE_DIR, f"shard-{shard}-of-{shards}")
+    main.get_image_cache.override(EmbeddingCache(main.cache_model_name(main.IMAGE_MODEL_NAME), main.IMAGE_DIM, cache_dir=cache_dir))
+    main.get_text_cache.override(EmbeddingCache(main.cache_model_name(main.TEXT_MODEL_NAME), main.TEXT_DIM, cache_dir=cache_dir))
+    # decode on threads here: a process pool per worker would oversubscribe the cores
+    main.get_preprocess_pool.override(ThreadPoolExecutor(max_workers=threads))
+    # one perceptual-hash index per shard as well: near-duplicates are only found
+    # within a shard, and shards never write the same index file
+    main.PHASH_DIR = os.path.join(main.PHASH_DIR, f"shard-{shard}-of-{shards}")
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            chunk_id, items = task
+            try:
+                ids, skipped = main.ingest_paths(collection_name, items, dedup=dedup)
+                results.put((shard, chunk_id, ids, skipped, None))
+            except Exception as e:
+                results.put((shard, chunk_id, [], [], f"{type(e).__name__}: {e}"))
+    finally:
+        # child processes exit without running atexit hooks
+        main.get_image_cache().save()
+        main.get_text_cache().save()
+        main.logg.close()
+
+
+class Coordinator:
+    def __init__(self, collection_name, workers, threads, retries=MAX_RETRIES, dedup="off"):
+        self.collection_name = collection_name
+        self.dedup = dedup
+        self.workers = workers
+        self.threads = threads
+        self.retries = retries
+        self.context = mp.get_context("spawn")  # fork + torch threads is unsafe
+        self.results = self.context.Queue()
+        self.processes = {}
+        self.queues = {}
+        self.chunks = {}
+        self.attempts = {}
+        self.pending = {shard: set() for shard in range(workers)}
+        self.uploaded_ids = []
+        self.skipped = []
+        self.failed = []
+
+    def _start(self, shard):
+        self.queues[shard] = self.context.Queue()
+        process = self.context.Process(
+            target=worker,
+            args=(shard, self.workers, self.threads, self.collection_name, self.queues[shard], self.results, self.dedup),
+            daemon=True
+        )
+        process.start()
+        self.processes[shard] = process
+        for chunk_id in sorted(self.pending[shard]):
+            self.queues[shard].put((chunk_id, self.chunks[chunk_id][1]))
+
+    def _retry(self, chunk_id, error):
+        shard = self.chunks[chunk_id][0]
+        self.attempts[chunk_id] += 1
+        if self.attempts[chunk_id] > self.retries:
+            self.pending[shard].discard(chunk_id)
+            self.failed.append((chunk_id, error))
+            print(f"Chunk {chunk_id} failed after {self.retries} retries: {error}")
+            return
+        print(f"Retrying chunk {chunk_id} (attempt {self.attempts[chunk_id] + 1}): {error}")
+        self.queues[shard].put((chunk_id, self.chunks[chunk_id][1]))
+
+    def _check_workers(self):
+        for shard, process in self.processes.items():
+            if process.is_alive() or not self.pending[shard]:
+                continue
+            # crashed (OOM, segfault...): the chunk it held is unknown, so every
+            # pending chunk of the shard counts an attempt before the restart
+            print(f"Worker {shard} died with exit code {process.exitcode}, restarting.")
+            for chunk_id in list(self.pending[shard]):
+                self.attempts[chunk_id] += 1
+                if self.attempts[chunk_id] > self.retries:
+                    self.pending[shard].discard(chunk_id)
+                    self.failed.append((chunk_id, f"worker exit code {process.exitcode}"))
+            self._start(shard)
+
+    def run(self, items):
+        open_chunk = {}
+        for path, description in items:
+            shard = shard_of(path, self.workers)
+            chunk_id = open_chunk.get(shard)
+            if chunk_id is None or len(self.chunks[chunk_id][1]) >= CHUNK_SIZE:
+                chunk_id = open_chunk[shard] = len(self.chunks)
+                self.chunks[chunk_id] = (shard, [])
+                self.attempts[chunk_id] = 0
+                self.pending[shard].add(chunk_id)
+            self.chunks[chunk_id][1].append((path, description))
+
+        total = len(items)
+        done = 0
+        start = time.perf_counter()
+        last_report = start
+        for shard in range(self.workers):
+            self._start(shard)
+        try:
+            while any(self.pending.values()):
+                try:
+                    shard, chunk_id, ids, skipped, error = self.results.get(timeout=1.0)
+                except queue.Empty:
+                    self._check_workers()
+                    continue
+                if chunk_id not in self.pending[shard]:
+                    continue  # late result of a chunk already given up on
+                if error is not None:
+                    self._retry(chunk_id, error)
+                    continue
+                self.pending[shard].discard(chunk_id)
+                self.uploaded_ids.extend(ids)
+                self.skipped.extend(skipped)
+                done += len(self.chunks[chunk_id][1])
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    print(f"{done}/{total} files, {len(self.uploaded_ids)} points, {done / (now - start):.1f} files/sec")
+        finally:
+            for shard, process in self.processes.items():
+                if process.is_alive():
+                    self.queues[shard].put(None)
+            for process in self.processes.values():
+                process.join()
+        elapsed = time.perf_counter() - start
+        print(
+            f"Ingested {len(self.uploaded_ids)} points from {total} files in {elapsed:.2f}s "
+            f"({len(self.uploaded_ids) / elapsed if elapsed > 0 else 0.0:.1f} points/sec) with {self.workers} workers, "
+            f"{len(self.skipped)} unreadable, {len(self.failed)} chunks failed."
+        )
+        return self.uploaded_ids
+
+def verify(collection_name, ids):
+    # every id a worker reported as uploaded must be retrievable
+    client = main.get_client()
+    missing = []
+    for start in range(0, len(ids), VERIFY_BATCH_SIZE):
+        batch = ids[start:start + VERIFY_BATCH_SIZE]
+        found = {str(record.id) for record in client.retrieve(collection_name=collection_name, ids=batch, with_payload=False, with_vectors=False)}
+        missing.extend(point_id for point_id in batch if str(point_id) not in found)
+    total = client.count(collection_name=collection_name, exact=True).count
+    print(f"Count check: {len(ids) - len(missing)}/{len(ids)} uploaded points present, collection holds {total}.")
+    return missing
+
+def run(args):
+    file_names = main.get_image_file_name(args.image_dir) or []
+    descriptions = cat_description()
+    items = [
+        (os.path.join(args.image_dir, file_name), descriptions[i] if i < len(descriptions) else "This is a cat.")
+        for i, file_name in enumerate(file_names)
+    ]
+    if not items:
+        print(f"No images found in '{args.image_dir}'.")
+        return None
+    # created once here so workers don't race on it
+    main.create_collection(args.collection)
+    workers = max(1, min(args.workers, len(items)))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"Ingesting {len(items)} files with {workers} workers x {threads} threads.")
+    coordinator = Coordinator(args.collection, workers, threads, retries=args.retries, dedup=args.dedup)
+    ids = coordinator.run(items)
+    missing = verify(args.collection, ids)
+    if missing:
+        print(f"{len(missing)} uploaded points are missing from '{args.collection}', re-run to retry them.")
+    return {"uploaded": len(ids), "missing": len(missing), "skipped": len(coordinator.skipped), "failed_chunks": len(coordinator.failed)}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest an image directory with one model per worker process.")
+    parser.add_argument("--image-dir", default="images/cats")
+    parser.add_argument("--collection", default="advanced_image_search")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--dedup", choices=["off", "alias", "reuse"], default=main.DEDUP_MODE, help="near-duplicate handling, see main.DEDUP_MODE")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,72 @@
+import argparse
+import json
+
+import numpy as np
+from qdrant_client.models import Distance
+
+import main
+from storage_profiles import STORAGE_PROFILES , recall_report
+
+# Recall-vs-latency for every storage profile, measured against exact search on
+# a copy of the real vectors (or synthetic ones). Needs a Qdrant server: local
+# mode does not implement quantization.
+#
+#   python storage_report.py --vector image --limit 20000 --queries 200
+
+
+def load_vectors(collection_name, vector_name, limit):
+    vectors = []
+    offset = None
+    while len(vectors) < limit:
+        points, offset = main.get_client().scroll(
+            collection_name=collection_name,
+            limit=min(1000, limit - len(vectors)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=[vector_name]
+        )
+        vectors.extend(point.vector[vector_name] for point in points)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        vectors = rng.standard_normal((args.synthetic, args.dim), dtype=np.float32)
+    else:
+        vectors = load_vectors(args.collection, args.vector, args.limit)
+    if len(vectors) == 0:
+        print(f"No vectors found in '{args.collection}'.")
+        return None
+
+    # queries: perturbed copies of stored vectors, so there is a meaningful neighbourhood
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.05 * vectors.std(), size=(len(picks), vectors.shape[1])).astype(np.float32)
+
+    report = recall_report(main.get_client(), vectors, queries, Distance.COSINE, top_k=args.top_k, profiles=args.profiles)
+    print(f"{'profile':<10} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for profile, row in report.items():
+        print(f"{profile:<10} {row['recall_at_k']:>10.4f} {row['latency_p50_ms']:>8.2f} {row['latency_p95_ms']:>8.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare storage profiles against exact search.")
+    parser.add_argument("--collection", default="advanced_image_search")
+    parser.add_argument("--vector", default="image", choices=["image", "text"])
+    parser.add_argument("--limit", type=int, default=20_000, help="vectors copied from --collection")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of --collection")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of --synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
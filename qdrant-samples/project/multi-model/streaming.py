@@ -0,0 +1,110 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import Batch
+
+
+def batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def decode_images(items, load, workers=4, max_pending=64, executor=None):
+    # yields (item, load(item)) in input order, with at most max_pending loads in flight.
+    # Pass a ProcessPoolExecutor as executor to decode outside the GIL (load must pickle).
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from decode_images(items, load, max_pending=max_pending, executor=pool)
+        return
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(load, item)))
+        if len(pending) >= max_pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+class AsyncUploader:
+    # Runs an AsyncQdrantClient on its own event loop thread. put() blocks once
+    # max_pending batches are queued, so producers can't outrun the network.
+    # on_upload(count) runs on that thread after each batch is accepted (applied, with wait=True).
+    def __init__(self, collection_name, host="localhost", port=6333, max_pending=4, concurrency=2, wait=False, on_upload=None):
+        self.collection_name = collection_name
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.wait = wait
+        self.on_upload = on_upload
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.uploaded = 0
+        self.failed = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def put(self, points):
+        # points: list of PointStruct, or columnar (ids, {name: (n, dim) array}, payloads)
+        self.queue.put(points)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        return self.uploaded
+
+    def _run(self):
+        asyncio.run(self._consume())
+
+    async def _consume(self):
+        client = AsyncQdrantClient(self.host, port=self.port)
+        loop = asyncio.get_running_loop()
+        in_flight = set()
+        try:
+            while True:
+                points = await loop.run_in_executor(None, self.queue.get)
+                if points is None:
+                    break
+                task = asyncio.create_task(self._upsert(client, points))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                if len(in_flight) >= self.concurrency:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            if in_flight:
+                await asyncio.wait(in_flight)
+        finally:
+            await client.close()
+
+    async def _upsert(self, client, points):
+        if isinstance(points, tuple):
+            ids, vectors, payloads = points
+            points = Batch(ids=ids, vectors=vectors, payloads=payloads)
+            count = len(ids)
+        else:
+            count = len(points)
+        try:
+            await client.upsert(
+                collection_name=self.collection_name,
+                points=points,
+                wait=self.wait
+            )
+        except Exception as e:
+            self.failed += count
+            print(f"Error uploading batch to Qdrant: {e}")
+            return
+        self.uploaded += count
+        if self.on_upload is not None:
+            self.on_upload(count)
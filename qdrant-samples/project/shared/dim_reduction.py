@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+# Linear dimensionality reduction for stored vectors: PCA fitted on a corpus
+# sample, or a seeded Gaussian random projection. The fitted matrix is saved as
+# .npz next to the collection it belongs to and must be applied identically at
+# ingest and at query time.
+
+
+class Reducer:
+    def __init__(self, kind, mean, components, explained_variance=None):
+        self.kind = kind
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)  # (dim, input_dim)
+        self.explained_variance = explained_variance
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @property
+    def input_dim(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit_pca(cls, vectors, dim):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dim > min(vectors.shape):
+            raise ValueError(f"PCA to {dim} dims needs at least {dim} sample vectors of size >= {dim}, got {vectors.shape}")
+        mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        variance = singular_values ** 2
+        explained = float(variance[:dim].sum() / variance.sum())
+        return cls("pca", mean, vt[:dim], explained_variance=explained)
+
+    @classmethod
+    def fit_random(cls, input_dim, dim, seed=0):
+        rng = np.random.default_rng(seed)
+        components = rng.standard_normal((dim, input_dim)).astype(np.float32) / np.sqrt(dim)
+        return cls("random", np.zeros(input_dim, dtype=np.float32), components)
+
+    def transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return (vectors - self.mean) @ self.components.T
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            kind=self.kind,
+            mean=self.mean,
+            components=self.components,
+            explained_variance=np.nan if self.explained_variance is None else self.explained_variance
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            explained = float(data["explained_variance"])
+            return cls(
+                str(data["kind"]),
+                data["mean"],
+                data["components"],
+                explained_variance=None if np.isnan(explained) else explained
+            )
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_k(base, queries, k):
+    # exact cosine top-k row indices, best first
+    scores = normalize(queries) @ normalize(base).T
+    k = min(k, base.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+def recall_at_k(base, queries, reducer, k=10):
+    # share of the full-dimension exact top-k that survives in the reduced space
+    truth = top_k(base, queries, k)
+    found = top_k(reducer.transform(base), reducer.transform(queries), k)
+    hits = [len(set(t) & set(f)) for t, f in zip(truth, found)]
+    return float(np.mean(hits) / truth.shape[1])
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+
+# Streams a CSV / TSV / JSONL / Parquet corpus into a collection in bounded chunks:
+# read chunk_size rows -> encode -> upload (wait=True) -> checkpoint, so memory
+# stays flat and a crashed run resumes after the last uploaded chunk.
+#
+#   index_file(client, "docs", "dump.parquet", encode, text_column="body",
+#              payload_columns={"title": "headline", "lang": "language"})
+
+CHUNK_SIZE = 2048
+UPLOAD_BATCH_SIZE = 256
+CHECKPOINT_DIR = ".checkpoints"
+PROGRESS_INTERVAL = 5.0
+
+FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet"
+}
+
+
+def detect_format(path):
+    root, ext = os.path.splitext(path.lower())
+    if ext in (".gz", ".bz2", ".zip", ".xz", ".zst"):
+        root, ext = os.path.splitext(root)  # pandas decompresses csv/jsonl by extension
+    if ext not in FORMATS:
+        raise ValueError(f"Unknown document format '{ext}' for {path}, expected one of {sorted(FORMATS)}")
+    return FORMATS[ext]
+
+def _read_csv(path, chunk_size, columns, start, sep):
+    import pandas as pd
+    # skiprows keeps the header; skipped lines are scanned but not parsed into frames
+    return pd.read_csv(path, sep=sep, usecols=columns, chunksize=chunk_size, skiprows=range(1, start + 1) if start else None)
+
+def _read_jsonl(path, chunk_size, columns, start):
+    import pandas as pd
+    skip = start
+    for frame in pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False):
+        if skip >= len(frame):
+            skip -= len(frame)
+            continue
+        frame = frame.iloc[skip:]
+        skip = 0
+        yield frame[columns] if columns is not None else frame
+
+def _read_parquet(path, chunk_size, columns, start):
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    # whole row groups before start are never read
+    first_group, group_start = 0, 0
+    while first_group < parquet.num_row_groups and group_start + parquet.metadata.row_group(first_group).num_rows <= start:
+        group_start += parquet.metadata.row_group(first_group).num_rows
+        first_group += 1
+    skip = start - group_start
+    batches = parquet.iter_batches(batch_size=chunk_size, columns=columns, row_groups=range(first_group, parquet.num_row_groups))
+    for batch in batches:
+        frame = batch.to_pandas()
+        if skip >= len(frame):
+            skip -= len(frame)
+            continue
+        yield frame.iloc[skip:]
+        skip = 0
+
+def read_chunks(path, chunk_size=CHUNK_SIZE, columns=None, start=0, format=None):
+    # DataFrames of at most chunk_size rows, beginning at row `start` of the file
+    format = format or detect_format(path)
+    if format in ("csv", "tsv"):
+        return _read_csv(path, chunk_size, columns, start, "," if format == "csv" else "\t")
+    if format == "jsonl":
+        return _read_jsonl(path, chunk_size, columns, start)
+    if format == "parquet":
+        return _read_parquet(path, chunk_size, columns, start)
+    raise ValueError(f"Unknown document format '{format}'")
+
+def point_id(source, row, value=None):
+    # id column values: ints as-is, anything else as a stable UUID of the value.
+    # Without one the id comes from the file and row position, so a chunk that is
+    # uploaded again after a resume overwrites its own points.
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return int(value)
+    name = str(value) if value is not None else f"{os.path.abspath(source)}#{row}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, name))
+
+def load_documents(path, text_column, payload_columns=None, id_column=None, chunk_size=CHUNK_SIZE, start=0, format=None, text_field=None):
+    # yields (rows read, ids, texts, payloads) per chunk. payload_columns maps
+    # payload field -> source column (a list keeps the names, None keeps every column),
+    # text_field also stores the text under that payload key. Rows with an empty
+    # text are counted as read but not returned.
+    if isinstance(payload_columns, (list, tuple)):
+        payload_columns = {column: column for column in payload_columns}
+    columns = None
+    if payload_columns is not None:
+        columns = list(dict.fromkeys([text_column, *payload_columns.values(), *([id_column] if id_column else [])]))
+    row = start
+    for frame in read_chunks(path, chunk_size, columns, start, format):
+        first, row = row, row + len(frame)
+        frame = frame.astype(object).where(frame.notna(), None)  # NaN -> null, numpy scalars -> Python
+        records = frame.to_dict("records")
+        ids, texts, payloads = [], [], []
+        for offset, record in enumerate(records):
+            text = record.get(text_column)
+            if text is None or not str(text).strip():
+                continue
+            ids.append(point_id(path, first + offset, record.get(id_column) if id_column else None))
+            texts.append(str(text))
+            payload = dict(record) if payload_columns is None else {field: record.get(column) for field, column in payload_columns.items()}
+            if text_field:
+                payload[text_field] = texts[-1]
+            payloads.append(payload)
+        yield len(frame), ids, texts, payloads
+
+def checkpoint_path_for(collection_name, path):
+    return os.path.join(CHECKPOINT_DIR, f"{collection_name}_{os.path.basename(path)}.json")
+
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def load_checkpoint(checkpoint_path, path):
+    # (rows already uploaded, finished) for this exact file; (0, False) if it changed since
+    if not os.path.exists(checkpoint_path):
+        return 0, False
+    with open(checkpoint_path, "r", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    if {key: checkpoint.get(key) for key in ("source", "size", "mtime")} != source_fingerprint(path):
+        print(f"{path} changed since checkpoint {checkpoint_path}, indexing from the start.")
+        return 0, False
+    return checkpoint.get("rows", 0), checkpoint.get("done", False)
+
+def save_checkpoint(checkpoint_path, path, rows, done=False):
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({**source_fingerprint(path), "rows": rows, "done": done}, file)
+    os.replace(tmp_path, checkpoint_path)
+
+def index_file(client, collection_name, path, encode, text_column, payload_columns=None, id_column=None,
+               chunk_size=CHUNK_SIZE, batch_size=UPLOAD_BATCH_SIZE, checkpoint_path=None, restart=False, format=None, text_field=None,
+               after_upload=None):
+    # encode(list of texts) -> (n, dim) array; after_upload(ids) runs after each chunk
+    # is written (e.g. to invalidate result caches). Returns the number of points uploaded by this run.
+    checkpoint_path = checkpoint_path or checkpoint_path_for(collection_name, path)
+    start, done = (0, False) if restart else load_checkpoint(checkpoint_path, path)
+    if done:
+        print(f"{path} is already indexed into '{collection_name}' ({start} rows), pass restart=True to index it again.")
+        return 0
+    if start:
+        print(f"Resuming {path} at row {start} from {checkpoint_path}.")
+    rows, uploaded = start, 0
+    began = last_report = time.perf_counter()
+    chunks = load_documents(path, text_column, payload_columns, id_column, chunk_size, start, format, text_field)
+    for read, ids, texts, payloads in chunks:
+        if ids:
+            client.upload_collection(
+                collection_name=collection_name,
+                vectors=np.asarray(encode(texts), dtype=np.float32),
+                payload=payloads,
+                ids=ids,
+                batch_size=batch_size,
+                wait=True  # the checkpoint must never get ahead of the collection
+            )
+            if after_upload is not None:
+                after_upload(ids)
+        rows += read
+        uploaded += len(ids)
+        save_checkpoint(checkpoint_path, path, rows)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            print(f"{path}: {rows} rows read, {uploaded} points uploaded ({uploaded / (now - began):.1f} points/sec).")
+    save_checkpoint(checkpoint_path, path, rows, done=True)
+    elapsed = time.perf_counter() - began
+    print(f"Indexed {uploaded} points from {path} into '{collection_name}' in {elapsed:.2f}s ({uploaded / elapsed if elapsed > 0 else 0.0:.1f} points/sec).")
+    return uploaded
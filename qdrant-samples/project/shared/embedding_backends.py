@@ -0,0 +1,228 @@
+import json
+import os
+
+import numpy as np
+
+# Pluggable inference for the ViT image model and the sentence-transformers text
+# models. "torch" is eager PyTorch fp32 (the old behaviour); "onnx" exports the
+# model once to ONNX and runs it with ONNX Runtime; "onnx-int8" additionally
+# applies dynamic int8 weight quantization. A non-torch backend is only used
+# after a parity check against PyTorch passes, otherwise we fall back to torch.
+#
+# onnx/onnxruntime are optional: pip install onnx onnxruntime
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_DIR = os.environ.get("ONNX_DIR", ".onnx")
+PARITY_TOLERANCE = 0.99  # minimum cosine similarity to the PyTorch vectors
+
+PARITY_TEXTS = [
+    "This is a black cat on wood in hous.",
+    "This is a white cat on pillow with blue eyes.",
+    "A man travels through time and witnesses the evolution of humanity.",
+    "Machine learning is a subset of artificial intelligence."
+]
+
+
+def model_dir(model_name, backend):
+    return os.path.join(ONNX_DIR, model_name.replace("/", "_"), backend)
+
+def cosine_rows(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return (a * b).sum(axis=1) / np.maximum(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12)
+
+def parity_check(reference, candidate, tolerance=PARITY_TOLERANCE):
+    similarity = cosine_rows(reference, candidate)
+    return {
+        "min_cosine": float(similarity.min()),
+        "mean_cosine": float(similarity.mean()),
+        "tolerance": tolerance,
+        "passed": bool(similarity.min() >= tolerance)
+    }
+
+def quantize_int8(source_path, target_path):
+    from onnxruntime.quantization import QuantType , quantize_dynamic
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+
+def onnx_session(path):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class TorchImageBackend:
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+
+    def embed(self, pixel_values):
+        import torch
+        with torch.inference_mode():
+            outputs = self.model(pixel_values=torch.from_numpy(np.ascontiguousarray(pixel_values, dtype=np.float32)))
+        return outputs.last_hidden_state[:,0,:].numpy()
+
+
+class OnnxImageBackend:
+    def __init__(self, path, name="onnx"):
+        self.name = name
+        self.session = onnx_session(path)
+
+    def embed(self, pixel_values):
+        hidden = self.session.run(None, {"pixel_values": np.ascontiguousarray(pixel_values, dtype=np.float32)})[0]
+        return hidden[:,0,:]
+
+    @staticmethod
+    def export(model, path, image_size=224):
+        import torch
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dummy = torch.zeros(1, 3, image_size, image_size)
+        torch.onnx.export(
+            model,
+            (dummy,),
+            path,
+            input_names=["pixel_values"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "last_hidden_state": {0: "batch"}},
+            opset_version=17
+        )
+
+
+class TorchTextBackend:
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+
+    def encode(self, texts, batch_size=64):
+        return self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+
+
+class OnnxTextBackend:
+    # transformer in ONNX Runtime, tokenizer + mean pooling (+ L2 normalize) in NumPy,
+    # mirroring the Transformer -> Pooling(mean) -> [Normalize] sentence-transformers stack
+    def __init__(self, directory, path, name="onnx"):
+        from transformers import AutoTokenizer
+        self.name = name
+        self.session = onnx_session(path)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        with open(os.path.join(directory, "pooling.json"), "r", encoding="utf-8") as file:
+            config = json.load(file)
+        self.max_seq_length = config["max_seq_length"]
+        self.normalize = config["normalize"]
+
+    def encode(self, texts, batch_size=64):
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            vectors.append(pooled.astype(np.float32))
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def export(sentence_model, directory, path):
+        import torch
+        from sentence_transformers.models import Normalize , Pooling
+        os.makedirs(directory, exist_ok=True)
+        transformer = sentence_model[0].auto_model
+        tokenizer = sentence_model.tokenizer
+        pooling = [module for module in sentence_model if isinstance(module, Pooling)]
+        if pooling and not pooling[0].pooling_mode_mean_tokens:
+            raise ValueError("ONNX text backend only supports mean pooling")
+
+        tokens = tokenizer(["export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in tokens]
+
+        class Wrapper(torch.nn.Module):
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, *inputs):
+                return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+        torch.onnx.export(
+            Wrapper(transformer),
+            tuple(tokens[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, "last_hidden_state": {0: "batch", 1: "sequence"}},
+            opset_version=17
+        )
+        tokenizer.save_pretrained(directory)
+        with open(os.path.join(directory, "pooling.json"), "w", encoding="utf-8") as file:
+            json.dump({
+                "max_seq_length": sentence_model.max_seq_length,
+                "normalize": any(isinstance(module, Normalize) for module in sentence_model)
+            }, file)
+
+
+def _onnx_paths(model_name, backend):
+    directory = model_dir(model_name, backend)
+    return directory, os.path.join(directory, "model.onnx"), os.path.join(directory, "model.fp32.onnx")
+
+def build_image_backend(model, model_name, backend=None, parity_pixels=None, image_size=224):
+    backend = backend or EMBEDDING_BACKEND
+    reference = TorchImageBackend(model)
+    if backend == "torch":
+        return reference
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    try:
+        directory, path, fp32_path = _onnx_paths(model_name, backend)
+        if not os.path.exists(path):
+            OnnxImageBackend.export(model, fp32_path if backend == "onnx-int8" else path, image_size=image_size)
+            if backend == "onnx-int8":
+                quantize_int8(fp32_path, path)
+        candidate = OnnxImageBackend(path, name=backend)
+        if parity_pixels is None:
+            parity_pixels = np.random.default_rng(0).uniform(-1, 1, size=(4, 3, image_size, image_size)).astype(np.float32)
+        parity = parity_check(reference.embed(parity_pixels), candidate.embed(parity_pixels))
+    except Exception as e:
+        print(f"Cannot use '{backend}' backend for {model_name}, falling back to torch: {e}")
+        return reference
+    if not parity["passed"]:
+        print(f"'{backend}' backend for {model_name} failed parity ({parity}), falling back to torch.")
+        return reference
+    print(f"Using '{backend}' backend for {model_name} (min cosine {parity['min_cosine']:.4f}).")
+    return candidate
+
+def build_text_backend(sentence_model, model_name, backend=None, parity_texts=PARITY_TEXTS):
+    backend = backend or EMBEDDING_BACKEND
+    reference = TorchTextBackend(sentence_model)
+    if backend == "torch":
+        return reference
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    try:
+        directory, path, fp32_path = _onnx_paths(model_name, backend)
+        if not os.path.exists(path):
+            OnnxTextBackend.export(sentence_model, directory, fp32_path if backend == "onnx-int8" else path)
+            if backend == "onnx-int8":
+                quantize_int8(fp32_path, path)
+        candidate = OnnxTextBackend(directory, path, name=backend)
+        parity = parity_check(reference.encode(parity_texts), candidate.encode(parity_texts))
+    except Exception as e:
+        print(f"Cannot use '{backend}' backend for {model_name}, falling back to torch: {e}")
+        return reference
+    if not parity["passed"]:
+        print(f"'{backend}' backend for {model_name} failed parity ({parity}), falling back to torch.")
+        return reference
+    print(f"Using '{backend}' backend for {model_name} (min cosine {parity['min_cosine']:.4f}).")
+    return candidate
@@ -0,0 +1,185 @@
+import atexit
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+
+CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", ".embedding_cache")
+DIGEST_SIZE = 16
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def key_digest(key):
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    # One cache per model, shared by every process that opens the same directory.
+    # Row i of vectors.f32 holds a vector, keys.bin the 16-byte digest of its key
+    # (all zeros = free) and ticks.i64 when it was last used; these memory-mapped
+    # files are the index, so every put is on disk at once and nothing is lost to
+    # a crash. Writers take the lock file and reuse the least recently used rows;
+    # readers check the row's digest before and after copying the vector, so a row
+    # that was evicted or is being rewritten is a miss, never another key's vector.
+    def __init__(self, model_name, dim, cache_dir=CACHE_DIR, max_entries=100_000):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.slots = {}  # digest -> row, rebuilt from keys.bin when another process wrote
+        self.generation = -1
+        self._open()
+        atexit.register(self.save)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self.lock:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.lock_file = open(os.path.join(self.path, "lock"), "a+")
+        meta = {"model_name": self.model_name, "dim": self.dim, "max_entries": self.max_entries}
+        files = {name: os.path.join(self.path, name) for name in ("vectors.f32", "keys.bin", "ticks.i64", "generation.i64")}
+        with self._locked():
+            existing = None
+            if os.path.exists(self.meta_path) and all(os.path.exists(path) for path in files.values()):
+                try:
+                    with open(self.meta_path, "r", encoding="utf-8") as file:
+                        existing = json.load(file)
+                except (OSError, ValueError) as e:
+                    print(f"Ignoring unreadable embedding cache {self.meta_path}: {e}")
+            mode = "r+" if existing == meta else "w+"
+            self.vectors = np.memmap(files["vectors.f32"], dtype=np.float32, mode=mode, shape=(self.max_entries, self.dim))
+            self.keys = np.memmap(files["keys.bin"], dtype=np.uint8, mode=mode, shape=(self.max_entries, DIGEST_SIZE))
+            self.ticks = np.memmap(files["ticks.i64"], dtype=np.int64, mode=mode, shape=(self.max_entries,))
+            self.header = np.memmap(files["generation.i64"], dtype=np.int64, mode=mode, shape=(1,))
+            if mode == "w+":
+                if os.path.exists(os.path.join(self.path, "index.json")):
+                    os.remove(os.path.join(self.path, "index.json"))  # index of the old single-process layout
+                with open(self.meta_path, "w", encoding="utf-8") as file:
+                    json.dump(meta, file)
+
+    def _refresh(self):
+        # rebuild the digest -> row map if any process has written since the last look
+        generation = int(self.header[0])
+        if generation == self.generation:
+            return False
+        keys = np.array(self.keys)
+        self.slots = {keys[row].tobytes(): int(row) for row in np.flatnonzero(keys.any(axis=1))}
+        self.generation = generation
+        return True
+
+    def _read(self, row, digest):
+        if self.keys[row].tobytes() != digest:
+            return None
+        vector = np.array(self.vectors[row])
+        if self.keys[row].tobytes() != digest:
+            return None
+        self.ticks[row] = time.time_ns()
+        return vector
+
+    def save(self):
+        with self.lock:
+            for array in (self.vectors, self.keys, self.ticks, self.header):
+                array.flush()
+
+    def __len__(self):
+        with self.lock:
+            self._refresh()
+            return len(self.slots)
+
+    def get(self, key):
+        digest = key_digest(key)
+        with self.lock:
+            row = self.slots.get(digest)
+            vector = self._read(row, digest) if row is not None else None
+            if vector is None and self._refresh():
+                row = self.slots.get(digest)
+                vector = self._read(row, digest) if row is not None else None
+            if vector is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        self.put_many([key], [vector])
+
+    def get_many(self, keys):
+        # returns (vectors, found) aligned with keys
+        vectors = np.zeros((len(keys), self.dim), dtype=np.float32)
+        found = np.zeros(len(keys), dtype=bool)
+        for row, key in enumerate(keys):
+            vector = self.get(key)
+            if vector is not None:
+                vectors[row] = vector
+                found[row] = True
+        return vectors, found
+
+    def put_many(self, keys, vectors):
+        # last vector per key; more keys than rows keeps the last max_entries
+        latest = list({key_digest(key): row for row, key in enumerate(keys)}.items())[-self.max_entries:]
+        if not latest:
+            return
+        with self._locked():
+            self._refresh()
+            rows = [self.slots.get(digest) for digest, _ in latest]
+            new = [index for index, row in enumerate(rows) if row is None]
+            if new:
+                ticks = np.array(self.ticks)
+                ticks[[row for row in rows if row is not None]] = np.iinfo(np.int64).max
+                for index, row in zip(new, np.argpartition(ticks, len(new) - 1)[:len(new)]):
+                    row = int(row)
+                    old = self.keys[row].tobytes()
+                    if self.slots.get(old) == row:
+                        del self.slots[old]
+                    rows[index] = row
+            now = time.time_ns()
+            for (digest, source), row in zip(latest, rows):
+                self.keys[row] = 0  # readers of the old key miss from here on
+                self.vectors[row] = vectors[source]
+                self.keys[row] = np.frombuffer(digest, dtype=np.uint8)
+                self.ticks[row] = now
+                self.slots[digest] = row
+            self.header[0] += 1
+            self.generation = int(self.header[0])
+
+
+def encode_with_cache(cache, items, encode, keys=None):
+    # encode(list_of_missing_items) -> array; only cache misses reach the model
+    if keys is None:
+        keys = [content_hash(item) for item in items]
+    vectors, found = cache.get_many(keys)
+    missing = np.flatnonzero(~found)
+    if len(missing):
+        new_vectors = np.asarray(encode([items[row] for row in missing]), dtype=np.float32)
+        vectors[missing] = new_vectors
+        cache.put_many([keys[row] for row in missing], new_vectors)
+    return vectors
@@ -0,0 +1,33 @@
+import functools
+import threading
+
+
+def lazy(factory):
+    # Turns a zero-argument factory into a process-wide singleton getter: the
+    # first call builds the value (once, even under concurrent first calls),
+    # later calls return it. get.loaded() tells whether it has been built,
+    # get.override(value) swaps in a replacement (tests, benchmarks, local mode)
+    # and get.reset() drops the value so the next call builds a fresh one.
+    lock = threading.Lock()
+    state = {}
+
+    @functools.wraps(factory)
+    def get():
+        if "value" not in state:
+            with lock:
+                if "value" not in state:
+                    state["value"] = factory()
+        return state["value"]
+
+    def override(value):
+        with lock:
+            state["value"] = value
+
+    def reset():
+        with lock:
+            state.pop("value", None)
+
+    get.loaded = lambda: "value" in state
+    get.override = override
+    get.reset = reset
+    return get
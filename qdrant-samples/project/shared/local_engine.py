@@ -0,0 +1,437 @@
+import uuid
+
+import numpy as np
+from qdrant_client.http.models import (
+    CountResult ,
+    Distance ,
+    FieldCondition ,
+    Filter ,
+    FormulaQuery ,
+    Fusion ,
+    FusionQuery ,
+    GroupsResult ,
+    HasIdCondition ,
+    MultExpression ,
+    PointGroup ,
+    PointIdsList ,
+    QueryResponse ,
+    RecommendQuery ,
+    RecommendStrategy ,
+    Record ,
+    ScoredPoint ,
+    SumExpression
+)
+
+# Exact in-process stand-in for the subset of QdrantClient the projects use.
+# Vectors live in contiguous float32 matrices (pre-normalized for cosine), so a
+# search is one matrix multiply plus argpartition. Handy offline, in tests and
+# as a recall oracle for HNSW/quantization settings.
+
+
+class LocalCollection:
+    def __init__(self, vectors_config, initial_capacity=1024):
+        self.named = isinstance(vectors_config, dict)
+        self.params = vectors_config if self.named else {"": vectors_config}
+        self.capacity = initial_capacity
+        self.matrices = {
+            name: np.zeros((initial_capacity, params.size), dtype=np.float32)
+            for name, params in self.params.items()
+        }
+        self.ids = []
+        self.payloads = []
+        self.alive = np.zeros(initial_capacity, dtype=bool)
+        self.row_of = {}
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def _grow(self, needed):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2)
+        for name, matrix in self.matrices.items():
+            grown = np.zeros((capacity, matrix.shape[1]), dtype=np.float32)
+            grown[:len(self.ids)] = matrix[:len(self.ids)]
+            self.matrices[name] = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.ids)] = self.alive[:len(self.ids)]
+        self.alive = alive
+        self.capacity = capacity
+
+    def _prepare(self, name, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.params[name].distance == Distance.COSINE:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _row(self, point_id):
+        row = self.row_of.get(point_id)
+        if row is None:
+            row = len(self.ids)
+            self._grow(row + 1)
+            self.ids.append(point_id)
+            self.payloads.append(None)
+            self.row_of[point_id] = row
+        return row
+
+    def upsert(self, points):
+        for point in points:
+            vectors = point.vector if self.named else {"": point.vector}
+            row = self._row(point.id)
+            for name, vector in vectors.items():
+                self.matrices[name][row] = self._prepare(name, vector)
+            self.payloads[row] = dict(point.payload or {})
+            self.alive[row] = True
+
+    def upsert_columns(self, ids, vectors, payloads=None):
+        # vectors: (n, dim) array, or {name: (n, dim) array} for named vectors;
+        # written into the matrices with one fancy-indexed assignment per name
+        vectors = vectors if isinstance(vectors, dict) else {"": vectors}
+        rows = np.fromiter((self._row(point_id) for point_id in ids), dtype=np.int64, count=len(ids))
+        for name, array in vectors.items():
+            self.matrices[name][rows] = self._prepare(name, array)
+        for i, row in enumerate(rows):
+            self.payloads[row] = dict(payloads[i] or {}) if payloads is not None else {}
+        self.alive[rows] = True
+
+    def delete(self, ids):
+        for point_id in ids:
+            row = self.row_of.pop(point_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.payloads[row] = None
+
+    def filter_mask(self, query_filter):
+        size = len(self.ids)
+        mask = self.alive[:size].copy()
+        if query_filter is not None:
+            mask &= np.fromiter(
+                (payload is not None and match_filter(query_filter, point_id, payload) for point_id, payload in zip(self.ids, self.payloads)),
+                dtype=bool,
+                count=size
+            )
+        return mask
+
+    def search(self, name, queries, limit, query_filter=None, offset=0):
+        # queries: (n, dim); returns one list of (row, score) per query, best first
+        params = self.params[name]
+        size = len(self.ids)
+        queries = self._prepare(name, np.atleast_2d(queries))
+        mask = self.filter_mask(query_filter)
+        if size == 0 or not mask.any():
+            return [[] for _ in range(len(queries))]
+
+        matrix = self.matrices[name][:size]
+        if params.distance == Distance.EUCLID:
+            scores = -np.sqrt(np.maximum(
+                (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ matrix.T + (matrix ** 2).sum(axis=1)[None, :],
+                0.0
+            ))
+        elif params.distance in (Distance.COSINE, Distance.DOT):
+            scores = queries @ matrix.T
+        else:
+            raise NotImplementedError(f"Distance {params.distance} is not supported by the local engine")
+        scores[:, ~mask] = -np.inf
+
+        k = min(limit + offset, int(mask.sum()))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            order = candidates[np.argsort(-query_scores[candidates], kind="stable")][offset:]
+            sign = -1.0 if params.distance == Distance.EUCLID else 1.0
+            results.append([(int(row), float(sign * query_scores[row])) for row in order])
+        return results
+
+
+def match_condition(condition, point_id, payload):
+    if isinstance(condition, Filter):
+        return match_filter(condition, point_id, payload)
+    if isinstance(condition, HasIdCondition):
+        return point_id in condition.has_id
+    if not isinstance(condition, FieldCondition):
+        raise NotImplementedError(f"Condition {type(condition).__name__} is not supported by the local engine")
+
+    value = payload.get(condition.key)
+    values = value if isinstance(value, list) else [value]
+    if condition.match is not None:
+        match = condition.match
+        if hasattr(match, "value"):
+            return match.value in values
+        if hasattr(match, "any"):
+            return any(v in match.any for v in values)
+        if hasattr(match, "except_"):
+            return all(v not in match.except_ for v in values)
+        if hasattr(match, "text"):
+            # like a lowercase full-text index
+            return any(isinstance(v, str) and match.text.lower() in v.lower() for v in values)
+    if condition.range is not None:
+        bounds = condition.range
+        return any(
+            isinstance(v, (int, float))
+            and (bounds.gt is None or v > bounds.gt)
+            and (bounds.gte is None or v >= bounds.gte)
+            and (bounds.lt is None or v < bounds.lt)
+            and (bounds.lte is None or v <= bounds.lte)
+            for v in values
+        )
+    raise NotImplementedError(f"Field condition on '{condition.key}' is not supported by the local engine")
+
+def match_filter(query_filter, point_id, payload):
+    must = query_filter.must or []
+    should = query_filter.should or []
+    must_not = query_filter.must_not or []
+    for conditions in (must, should, must_not):
+        if not isinstance(conditions, list):
+            raise NotImplementedError("Single-condition filters are not supported, pass a list")
+    return (
+        all(match_condition(c, point_id, payload) for c in must)
+        and (not should or any(match_condition(c, point_id, payload) for c in should))
+        and not any(match_condition(c, point_id, payload) for c in must_not)
+    )
+
+RRF_K = 2  # Qdrant's default reciprocal rank fusion constant
+
+
+def is_point_id(query):
+    return isinstance(query, (int, str))
+
+def merge_filters(*filters):
+    filters = [f for f in filters if f is not None]
+    if len(filters) < 2:
+        return filters[0] if filters else None
+    return Filter(must=filters)
+
+def evaluate_formula(expression, variables, defaults):
+    # the subset of Qdrant formulas hybrid search builds: constants, "$score[i]", sum, mult
+    if isinstance(expression, (int, float)):
+        return float(expression)
+    if isinstance(expression, str):
+        return float(variables.get(expression, defaults.get(expression, 0.0)))
+    if isinstance(expression, SumExpression):
+        return sum(evaluate_formula(e, variables, defaults) for e in expression.sum)
+    if isinstance(expression, MultExpression):
+        result = 1.0
+        for e in expression.mult:
+            result *= evaluate_formula(e, variables, defaults)
+        return result
+    raise NotImplementedError(f"Formula expression {type(expression).__name__} is not supported by the local engine")
+
+def fuse(query, hit_lists):
+    # hit_lists: one [(row, score), ...] per prefetch, best first -> {row: fused score}
+    fused = {}
+    if isinstance(query, FusionQuery) and query.fusion == Fusion.RRF:
+        for hits in hit_lists:
+            for position, (row, _) in enumerate(hits):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + position)
+    elif isinstance(query, FusionQuery) and query.fusion == Fusion.DBSF:
+        # distribution-based: each list normalized to mean +- 3 std, then summed
+        for hits in hit_lists:
+            if not hits:
+                continue
+            scores = np.array([score for _, score in hits], dtype=np.float64)
+            std = scores.std(ddof=1) if len(scores) > 1 else 0.0
+            low, high = scores.mean() - 3 * std, scores.mean() + 3 * std
+            for row, score in hits:
+                fused[row] = fused.get(row, 0.0) + (float((score - low) / (high - low)) if high > low else 0.5)
+    elif isinstance(query, FormulaQuery):
+        per_prefetch = [dict(hits) for hits in hit_lists]
+        defaults = query.defaults or {}
+        for row in set().union(*per_prefetch):
+            variables = {f"$score[{i}]": scores[row] for i, scores in enumerate(per_prefetch) if row in scores}
+            if len(per_prefetch) == 1 and row in per_prefetch[0]:
+                variables["$score"] = per_prefetch[0][row]
+            fused[row] = evaluate_formula(query.formula, variables, defaults)
+    else:
+        raise NotImplementedError(f"Query {type(query).__name__} over prefetches is not supported by the local engine")
+    return fused
+
+
+class LocalVectorClient:
+    def __init__(self):
+        self.collections = {}
+
+    def close(self):
+        pass
+
+    def collection_exists(self, collection_name):
+        return collection_name in self.collections
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        self.collections[collection_name] = LocalCollection(vectors_config)
+        return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        return self.collections.pop(collection_name, None) is not None
+
+    def create_payload_index(self, collection_name, field_name, field_schema=None, **kwargs):
+        # every filter is a scan here, nothing to build
+        return None
+
+    def count(self, collection_name, count_filter=None, **kwargs):
+        collection = self.collections[collection_name]
+        if count_filter is None:
+            return CountResult(count=len(collection))
+        return CountResult(count=int(collection.filter_mask(count_filter).sum()))
+
+    def upsert(self, collection_name, points, wait=True, **kwargs):
+        self.collections[collection_name].upsert(points)
+
+    def upload_points(self, collection_name, points, batch_size=64, parallel=1, wait=True, **kwargs):
+        self.collections[collection_name].upsert(list(points))
+
+    def upload_collection(self, collection_name, vectors, payload=None, ids=None, batch_size=64, parallel=1, wait=True, **kwargs):
+        named = isinstance(vectors, dict)
+        count = len(next(iter(vectors.values()))) if named else len(vectors)
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in range(count)]
+        payload = list(payload) if payload is not None else None
+        self.collections[collection_name].upsert_columns(ids, vectors, payload)
+
+    def delete(self, collection_name, points_selector, wait=True, **kwargs):
+        ids = points_selector.points if isinstance(points_selector, PointIdsList) else points_selector
+        self.collections[collection_name].delete(ids)
+
+    def set_payload(self, collection_name, payload, points, wait=True, **kwargs):
+        # merges keys into the existing payloads, like Qdrant's set_payload
+        collection = self.collections[collection_name]
+        for point_id in (points.points if isinstance(points, PointIdsList) else points):
+            row = collection.row_of.get(point_id)
+            if row is not None:
+                collection.payloads[row].update(payload)
+
+    def _scored(self, collection, hits, with_payload=True):
+        return [
+            ScoredPoint(
+                id=collection.ids[row],
+                version=0,
+                score=score,
+                payload=collection.payloads[row] if with_payload else None
+            )
+            for row, score in hits
+        ]
+
+    def search_many(self, collection_name, vector_name, query_vectors, limit=10, query_filter=None, with_payload=True, offset=0):
+        # batched exact top-k for a (n, dim) query matrix against one named vector
+        collection = self.collections[collection_name]
+        results = collection.search(vector_name, query_vectors, limit, query_filter=query_filter, offset=offset or 0)
+        return [self._scored(collection, hits, with_payload) for hits in results]
+
+    def search(self, collection_name, query_vector, query_filter=None, limit=10, offset=0, with_payload=True, **kwargs):
+        vector_name = ""
+        if isinstance(query_vector, tuple):
+            vector_name, query_vector = query_vector
+        elif hasattr(query_vector, "name"):
+            # NamedVector
+            vector_name, query_vector = query_vector.name, query_vector.vector
+        return self.search_many(collection_name, vector_name, [query_vector], limit, query_filter, with_payload, offset)[0]
+
+    def search_batch(self, collection_name, requests, **kwargs):
+        return [
+            self.search(
+                collection_name,
+                query_vector=request.vector,
+                query_filter=request.filter,
+                limit=request.limit,
+                offset=request.offset or 0,
+                with_payload=request.with_payload is not False
+            )
+            for request in requests
+        ]
+
+    def _resolve(self, collection, query, using, query_filter):
+        # point id / RecommendQuery -> vector built from stored vectors, with the
+        # input points filtered out of the results; plain vectors pass through
+        if not is_point_id(query) and not isinstance(query, RecommendQuery):
+            return query, query_filter
+        if is_point_id(query):
+            positive, negative, strategy = [query], [], None
+        else:
+            positive = list(query.recommend.positive or [])
+            negative = list(query.recommend.negative or [])
+            strategy = query.recommend.strategy
+        if strategy not in (None, RecommendStrategy.AVERAGE_VECTOR):
+            raise NotImplementedError(f"Recommend strategy {strategy} is not supported by the local engine")
+        if not positive or not all(is_point_id(p) for p in positive + negative):
+            raise NotImplementedError("The local engine recommends from at least one positive point id, ids only")
+        missing = [p for p in positive + negative if p not in collection.row_of]
+        if missing:
+            raise ValueError(f"No point with id {missing[0]}")
+
+        def stored(ids):
+            return collection.matrices[using][[collection.row_of[i] for i in ids]].mean(axis=0)
+
+        # Qdrant's average_vector: avg(positive) + (avg(positive) - avg(negative))
+        vector = stored(positive)
+        if negative:
+            vector = 2 * vector - stored(negative)
+        return vector, merge_filters(query_filter, Filter(must_not=[HasIdCondition(has_id=positive + negative)]))
+
+    def _fused(self, collection, query, prefetch, query_filter):
+        # one level of prefetches (no nesting), fused on the top-level query; best first
+        hit_lists = []
+        for p in (prefetch if isinstance(prefetch, list) else [prefetch]):
+            prefetch_query, prefetch_filter = self._resolve(collection, p.query, p.using or "", merge_filters(query_filter, p.filter))
+            hit_lists.append(collection.search(p.using or "", [prefetch_query], p.limit or 10, query_filter=prefetch_filter)[0])
+        return sorted(fuse(query, hit_lists).items(), key=lambda item: -item[1])
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        collection = self.collections[collection_name]
+        names = list(collection.params) if with_vectors is True else list(with_vectors or [])
+        records = []
+        for point_id in ids:
+            row = collection.row_of.get(point_id)
+            if row is None:
+                continue
+            vectors = {name: collection.matrices[name][row].tolist() for name in names}
+            records.append(Record(
+                id=point_id,
+                payload=collection.payloads[row] if with_payload else None,
+                vector=(vectors if collection.named else vectors.get("")) if names else None
+            ))
+        return records
+
+    def query_points(self, collection_name, query=None, using=None, prefetch=None, query_filter=None, limit=10, offset=0, with_payload=True, **kwargs):
+        collection = self.collections[collection_name]
+        if prefetch is None:
+            query, query_filter = self._resolve(collection, query, using or "", query_filter)
+            points = self.search_many(collection_name, using or "", [query], limit, query_filter, with_payload, offset)[0]
+            return QueryResponse(points=points)
+        ranked = self._fused(collection, query, prefetch, query_filter)[offset:offset + limit]
+        return QueryResponse(points=self._scored(collection, ranked, with_payload))
+
+    def query_points_groups(self, collection_name, group_by, query=None, using=None, prefetch=None, query_filter=None, limit=10, group_size=3, with_payload=True, **kwargs):
+        collection = self.collections[collection_name]
+        if prefetch is None:
+            query, query_filter = self._resolve(collection, query, using or "", query_filter)
+            ranked = collection.search(using or "", [query], len(collection), query_filter=query_filter)[0]
+        else:
+            ranked = self._fused(collection, query, prefetch, query_filter)
+        groups = {}
+        for row, score in ranked:
+            value = (collection.payloads[row] or {}).get(group_by)
+            if value is None or isinstance(value, (list, dict)):
+                continue
+            if value not in groups:
+                if len(groups) == limit:
+                    continue
+                groups[value] = []
+            if len(groups[value]) < group_size:
+                groups[value].append((row, score))
+        return GroupsResult(groups=[
+            PointGroup(id=value, hits=self._scored(collection, hits, with_payload))
+            for value, hits in groups.items()
+        ])
+
+    def query_batch_points(self, collection_name, requests, **kwargs):
+        return [
+            self.query_points(
+                collection_name,
+                query=request.query,
+                using=request.using,
+                query_filter=request.filter,
+                limit=request.limit or 10,
+                offset=request.offset or 0,
+                with_payload=request.with_payload is not False
+            )
+            for request in requests
+        ]
@@ -0,0 +1,169 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler , ThreadingHTTPServer
+
+# Per-stage latency histograms, kept in process and exported as Prometheus text
+# or JSON snapshots. With METRICS_ENABLED=0 (or disable()) timer() hands back a
+# shared no-op object, so instrumented hot paths cost one call and a flag check.
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_NAME = "pipeline_stage_seconds"
+
+enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+registry = {}
+registry_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("name", "buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, name, buckets=BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "buckets": list(self.buckets),
+                "counts": list(self.counts),
+                "sum": self.sum,
+                "count": self.count
+            }
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def histogram(stage):
+    hist = registry.get(stage)
+    if hist is None:
+        with registry_lock:
+            hist = registry.setdefault(stage, Histogram(stage))
+    return hist
+
+def timer(stage):
+    if not enabled:
+        return NULL_TIMER
+    return _Timer(histogram(stage))
+
+def timed(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Timer(histogram(stage)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def observe(stage, seconds):
+    if enabled:
+        histogram(stage).observe(seconds)
+
+def reset():
+    with registry_lock:
+        registry.clear()
+
+def snapshot():
+    return {stage: hist.snapshot() for stage, hist in list(registry.items())}
+
+def prometheus_text():
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent per pipeline stage.",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for stage, data in sorted(snapshot().items()):
+        cumulative = 0
+        for bound, count in zip(data["buckets"], data["counts"]):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {data["sum"]}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {data["count"]}')
+    return "\n".join(lines) + "\n"
+
+def write_snapshot(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"timestamp": time.time(), "stages": snapshot()}, file)
+    os.replace(tmp_path, path)
+
+def start_snapshots(path, interval=30.0):
+    # writes a JSON snapshot every `interval` seconds from a daemon thread
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                write_snapshot(path)
+            except OSError as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    threading.Thread(target=loop, daemon=True).start()
+    return stop
+
+def serve_prometheus(port=9100, host="0.0.0.0"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
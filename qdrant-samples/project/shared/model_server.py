@@ -0,0 +1,207 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client , Listener
+
+import numpy as np
+
+import metrics
+
+# One process holds the models and serves embeddings to every ingest worker and
+# query process on the box over a Unix socket. Requests from all callers are
+# merged into one batch per model (dynamic batching: wait up to `window`
+# seconds or until `max_batch` rows are queued). Arrays travel as raw float32
+# bytes: the client reads the reply straight into a preallocated NumPy array.
+#
+# Wire format, per request on one connection:
+#   client -> ("image", shape) + raw NCHW float32 bytes   or   ("text", [str, ...])
+#   server -> ("ok", shape) + raw float32 bytes            or   ("error", message)
+
+EMBEDDING_SERVER = os.environ.get("EMBEDDING_SERVER")  # socket path; unset = load models in-process
+DEFAULT_SOCKET = "/tmp/embedding_server.sock"
+# requests are unpickled: the socket is only accessible to its owner, and with a
+# shared key set (same value for server and clients) every connection must pass
+# an HMAC challenge first
+EMBEDDING_SERVER_AUTHKEY = os.environ.get("EMBEDDING_SERVER_AUTHKEY")
+
+
+def authkey():
+    return EMBEDDING_SERVER_AUTHKEY.encode("utf-8") if EMBEDDING_SERVER_AUTHKEY else None
+
+
+def send_array(conn, header, array):
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    conn.send((header, array.shape))
+    conn.send_bytes(array.reshape(-1).view(np.uint8))
+
+def recv_array(conn, shape):
+    array = np.empty(shape, dtype=np.float32)
+    conn.recv_bytes_into(array.reshape(-1).view(np.uint8))
+    return array
+
+
+class DynamicBatcher:
+    # submit(rows) -> Future; a single worker thread runs `process` on the
+    # concatenation of everything queued within the window, then splits it back
+    def __init__(self, name, process, join, max_batch=64, window=0.005):
+        self.name = name
+        self.process = process
+        self.join = join
+        self.max_batch = max_batch
+        self.window = window
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, rows):
+        future = Future()
+        self.queue.put((rows, future))
+        return future
+
+    def _collect(self):
+        pending = [self.queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                with metrics.timer(f"server_{self.name}_batch"):
+                    vectors = np.asarray(self.process(self.join([rows for rows, _ in pending])), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for rows, future in pending:
+                future.set_result(vectors[start:start + len(rows)])
+                start += len(rows)
+
+
+class EmbeddingServer:
+    def __init__(self, image_embed=None, text_encode=None, address=DEFAULT_SOCKET, max_batch=64, window=0.005):
+        # image_embed(NCHW float32) -> (N, D) / text_encode(list of str) -> (N, D); either may be None
+        self.address = address
+        self.batchers = {}
+        if image_embed is not None:
+            self.batchers["image"] = DynamicBatcher("image", image_embed, np.concatenate, max_batch=max_batch, window=window)
+        if text_encode is not None:
+            self.batchers["text"] = DynamicBatcher("text", text_encode, lambda parts: [text for part in parts for text in part], max_batch=max_batch, window=window)
+        self.listener = None
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)  # stale socket from a previous run
+        # owner-only from the moment it is bound, not after a chmod
+        umask = os.umask(0o177)
+        try:
+            self.listener = Listener(self.address, family="AF_UNIX", authkey=authkey())
+        finally:
+            os.umask(umask)
+        print(f"Embedding server listening on {self.address} ({', '.join(self.batchers)}{', authkey required' if authkey() else ''}).")
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except (AuthenticationError, EOFError, ConnectionError) as e:
+                    print(f"Rejected embedding server connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.address):
+                os.remove(self.address)
+
+    def _handle(self, conn):
+        try:
+            while True:
+                kind, payload = conn.recv()
+                if kind == "image":
+                    rows = recv_array(conn, payload)
+                else:
+                    rows = payload
+                batcher = self.batchers.get(kind)
+                try:
+                    if batcher is None:
+                        raise ValueError(f"server does not serve '{kind}' embeddings")
+                    vectors = batcher.submit(rows).result() if len(rows) else np.zeros((0, 0), dtype=np.float32)
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+                    continue
+                send_array(conn, "ok", vectors)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+class EmbeddingClient:
+    # one connection per thread; a dropped connection is reopened on the next call
+    def __init__(self, address=None):
+        self.address = address or EMBEDDING_SERVER or DEFAULT_SOCKET
+        self.local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = Client(self.address, family="AF_UNIX", authkey=authkey())
+        return conn
+
+    def _request(self, send):
+        conn = self._conn()
+        try:
+            send(conn)
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            self.local.conn = None
+            raise
+        if status != "ok":
+            raise RuntimeError(f"embedding server error: {payload}")
+        return recv_array(conn, payload)
+
+    def embed_images(self, pixel_values):
+        return self._request(lambda conn: send_array(conn, "image", pixel_values))
+
+    def encode_texts(self, texts):
+        return self._request(lambda conn: conn.send(("text", list(texts))))
+
+
+class RemoteImageBackend:
+    # drop-in for the embedding_backends image backends
+    name = "remote"
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed(self, pixel_values):
+        return self.client.embed_images(pixel_values)
+
+
+class RemoteTextBackend:
+    name = "remote"
+
+    def __init__(self, client):
+        self.client = client
+
+    def encode(self, texts, batch_size=64):
+        return self.client.encode_texts(texts)
@@ -0,0 +1,53 @@
+from qdrant_client.http.models import (
+    FieldCondition ,
+    Filter ,
+    MatchAny ,
+    MatchText ,
+    MatchValue ,
+    PayloadSchemaType ,
+    Range ,
+    TextIndexParams ,
+    TextIndexType ,
+    TokenizerType
+)
+
+# Declarative payload indexes, {field: "keyword" | "text" | "integer" | "float" | "bool" | ...},
+# created with the collection, and structured filters built against them. With
+# an index Qdrant answers a filter from the index instead of scanning payloads,
+# and its query planner estimates the filter's cardinality from it: subsets
+# below the collection's hnsw full_scan_threshold are searched exactly.
+
+
+def index_schema(kind):
+    if kind == "text":
+        # full-text index: word tokens, case-insensitive, used by MatchText
+        return TextIndexParams(type=TextIndexType.TEXT, tokenizer=TokenizerType.WORD, lowercase=True)
+    return PayloadSchemaType(kind)
+
+def create_payload_indexes(client, collection_name, indexes):
+    # idempotent: re-creating an existing index with the same schema is a no-op
+    for field_name, kind in indexes.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=index_schema(kind),
+            wait=True
+        )
+
+def build_filter(filters, indexes=None):
+    # {"category": "animal", "type_of_category": ["cat", "dog"], "year": {"gte": 1950}}
+    # -> Filter(must=[...]); None values are skipped. Fields indexed as "text"
+    # match on tokens (MatchText), everything else matches exactly.
+    conditions = []
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            conditions.append(FieldCondition(key=key, range=Range(**value)))
+        elif isinstance(value, (list, tuple, set)):
+            conditions.append(FieldCondition(key=key, match=MatchAny(any=list(value))))
+        elif (indexes or {}).get(key) == "text":
+            conditions.append(FieldCondition(key=key, match=MatchText(text=value)))
+        else:
+            conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+    return Filter(must=conditions) if conditions else None
@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+from PIL import Image , UnidentifiedImageError
+
+# 64-bit perceptual hashes for spotting re-encoded / resized copies of the same
+# photo, and an index to find stored hashes within a Hamming distance.
+# Hashing decodes at reduced resolution (JPEG draft mode), so it costs a small
+# fraction of the full decode + ViT forward pass it can save.
+
+HASH_SIZE = 8
+PHASH_SIZE = 32
+
+
+def _gray(image_path, size):
+    with Image.open(image_path) as img:
+        img.draft("L", (size[0] * 4, size[1] * 4))
+        return np.asarray(img.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+def _to_int(bits):
+    return int("".join("1" if bit else "0" for bit in bits.ravel()), 2)
+
+def ahash(image_path):
+    pixels = _gray(image_path, (HASH_SIZE, HASH_SIZE))
+    return _to_int(pixels > pixels.mean())
+
+def dhash(image_path):
+    # horizontal gradient signs: robust to brightness/contrast changes and re-encoding
+    pixels = _gray(image_path, (HASH_SIZE + 1, HASH_SIZE))
+    return _to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+DCT = _dct_matrix(PHASH_SIZE)
+
+def phash(image_path):
+    # low-frequency DCT coefficients against their median (DC term excluded)
+    pixels = _gray(image_path, (PHASH_SIZE, PHASH_SIZE))
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _to_int(low > np.median(low.ravel()[1:]))
+
+HASHES = {"ahash": ahash, "dhash": dhash, "phash": phash}
+
+def image_hash(image_path, kind="dhash"):
+    # None for unreadable files, the full decode reports those
+    try:
+        return HASHES[kind](image_path)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return None
+
+if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+    popcount = np.bitwise_count
+else:
+    _BYTE_BITS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+def hamming_distances(key, keys):
+    return popcount(np.bitwise_xor(keys, np.uint64(key)))
+
+
+class HashIndex:
+    # Multi-index hashing: the 64 bits are cut into max_distance + 1 bands, and two
+    # hashes within max_distance must agree exactly on at least one band, so a lookup
+    # only measures the rows sharing a band with the query (one vectorized popcount)
+    # instead of walking every stored hash.
+    # One hash per value: adding a value again with a new hash replaces its entry.
+    # save() appends what was added since the last save; the log is rewritten once
+    # it holds twice as many lines as the index.
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        edges = np.linspace(0, 64, max_distance + 2).astype(int)
+        self.bands = [(int(low), (1 << int(high - low)) - 1) for low, high in zip(edges[:-1], edges[1:])]
+        self.tables = [{} for _ in self.bands]
+        self.hashes = np.zeros(1024, dtype=np.uint64)
+        self.values = []
+        self.rows = {}  # value -> row
+        self.pending = []
+        self.logged = 0
+        self.torn = False  # the log ends in a partial line, appending would corrupt the next one
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self.rows
+
+    def _band_keys(self, key):
+        return [(key >> shift) & mask for shift, mask in self.bands]
+
+    def add(self, key, value):
+        row = self.rows.get(value)
+        if row is not None:
+            if int(self.hashes[row]) == key:
+                return
+            for table, band in zip(self.tables, self._band_keys(int(self.hashes[row]))):
+                table[band].remove(row)
+        else:
+            row = len(self.values)
+            if row == len(self.hashes):
+                self.hashes = np.concatenate([self.hashes, np.zeros(len(self.hashes), dtype=np.uint64)])
+            self.values.append(value)
+            self.rows[value] = row
+        self.hashes[row] = key
+        for table, band in zip(self.tables, self._band_keys(key)):
+            table.setdefault(band, []).append(row)
+        self.pending.append((key, value))
+
+    def nearest(self, key, max_distance=None):
+        # (distance, value) of the closest stored hash within max_distance, or None
+        max_distance = self.max_distance if max_distance is None else max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f"index was built for distances up to {self.max_distance}, got {max_distance}")
+        candidates = [rows for table, band in zip(self.tables, self._band_keys(key)) for rows in (table.get(band),) if rows]
+        if not candidates:
+            return None
+        candidates = np.concatenate(candidates) if len(candidates) > 1 else np.asarray(candidates[0])
+        distances = hamming_distances(key, self.hashes[candidates])
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        return int(distances[best]), self.values[candidates[best]]
+
+    def items(self):
+        return ((int(self.hashes[row]), value) for row, value in enumerate(self.values))
+
+    def save(self, path):
+        if self.torn or self.logged + len(self.pending) > 2 * max(len(self), 1024):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.writelines(f"{key:016x} {value}\n" for key, value in self.items())
+            os.replace(tmp_path, path)
+            self.logged = len(self)
+            self.torn = False
+        elif self.pending:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as file:
+                file.writelines(f"{key:016x} {value}\n" for key, value in self.pending)
+            self.logged += len(self.pending)
+        self.pending = []
+
+    @classmethod
+    def load(cls, path, max_distance):
+        # later lines win; a line cut short by a crash is skipped
+        index = cls(max_distance)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    key, _, value = line.rstrip("\n").partition(" ")
+                    if line.endswith("\n") and len(key) == 16 and value:
+                        index.add(int(key, 16), value)
+                        index.logged += 1
+                    else:
+                        index.torn = True
+        index.pending = []
+        return index
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class ResultCache:
+    # Search results keyed by (collection, vector name, query vector hash, filter, limit).
+    # Entries expire after `ttl` seconds; invalidate(collection) bumps a per-collection
+    # generation so every cached result for it is treated as stale at once. Writers
+    # invalidate once Qdrant has acknowledged the write (wait=True), and a result is
+    # stored under the generation read before its search ran, so a search that raced
+    # with a write is never served from the cache.
+    def __init__(self, maxsize=10_000, ttl=60.0):
+        self.ttl = ttl
+        self.entries = LRUCache(maxsize=maxsize)
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.entries.maxsize > 0
+
+    @staticmethod
+    def key(collection_name, vector_name, query_vector, query_filter=None, limit=10):
+        vector_hash = hashlib.blake2b(np.asarray(query_vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+        return (collection_name, vector_name, vector_hash, repr(query_filter), limit)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        generation, expires_at, value = entry
+        if generation != self.generations.get(key[0], 0) or expires_at < time.monotonic():
+            return None
+        return value
+
+    def generation(self, collection_name):
+        return self.generations.get(collection_name, 0)
+
+    def put(self, key, value, generation=None):
+        # generation: generation(collection) taken before the search was sent
+        if generation is None:
+            generation = self.generation(key[0])
+        self.entries.put(key, (generation, time.monotonic() + self.ttl, value))
+
+    def invalidate(self, collection_name):
+        with self.lock:
+            self.generations[collection_name] = self.generations.get(collection_name, 0) + 1
@@ -0,0 +1,167 @@
+import os
+import time
+
+import numpy as np
+from qdrant_client.local.qdrant_local import QdrantLocal
+from qdrant_client.models import (
+    BinaryQuantization ,
+    BinaryQuantizationConfig ,
+    CollectionStatus ,
+    CompressionRatio ,
+    OptimizersConfigDiff ,
+    ProductQuantization ,
+    ProductQuantizationConfig ,
+    QuantizationSearchParams ,
+    ScalarQuantization ,
+    ScalarQuantizationConfig ,
+    ScalarType ,
+    SearchParams ,
+    VectorParams
+)
+
+# How collections store their vectors. Quantized profiles keep the compressed
+# vectors in RAM, push the float32 originals to disk and rescore the top
+# `limit * oversampling` candidates against the originals at query time.
+#
+#   float32  full precision in RAM (the old behaviour)
+#   int8     scalar quantization, ~4x less RAM
+#   pq       product quantization x16, ~16x less RAM
+#   binary   1 bit per dimension, ~32x less RAM (best on 768-d ViT-style vectors)
+
+STORAGE_PROFILES = {
+    "float32": {"quantization": None, "on_disk": False, "oversampling": None},
+    "int8": {"quantization": "scalar", "on_disk": True, "oversampling": 2.0},
+    "pq": {"quantization": "product", "on_disk": True, "oversampling": 3.0},
+    "binary": {"quantization": "binary", "on_disk": True, "oversampling": 3.0}
+}
+
+DEFAULT_PROFILE = os.environ.get("STORAGE_PROFILE", "float32")
+REPORT_INDEXING_THRESHOLD_KB = 1  # build HNSW + quantized vectors for every segment of a report collection
+INDEX_TIMEOUT = 600.0
+
+collection_profiles = {}
+
+
+def get_profile(name=None):
+    name = name or DEFAULT_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{name}', expected one of {sorted(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+def vector_params(size, distance, profile=None):
+    return VectorParams(size=size, distance=distance, on_disk=get_profile(profile)["on_disk"])
+
+def quantization_config(profile=None):
+    kind = get_profile(profile)["quantization"]
+    if kind == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "product":
+        return ProductQuantization(product=ProductQuantizationConfig(compression=CompressionRatio.X16, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def search_params(profile=None, exact=False):
+    if exact:
+        return SearchParams(exact=True)
+    oversampling = get_profile(profile)["oversampling"]
+    if oversampling is None:
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=oversampling))
+
+def profile_of(info):
+    # storage profile a collection was created with, from its get_collection() info
+    quantization = info.config.quantization_config
+    if isinstance(quantization, ScalarQuantization):
+        return "int8"
+    if isinstance(quantization, ProductQuantization):
+        return "pq"
+    if isinstance(quantization, BinaryQuantization):
+        return "binary"
+    return "float32"
+
+def collection_profile(client, collection_name):
+    # read once per collection: the profile lives in the collection config, not in
+    # STORAGE_PROFILE, which only picks the profile of newly created collections
+    if collection_name not in collection_profiles:
+        if not hasattr(client, "get_collection"):
+            return "float32"  # LocalVectorClient: exact search, nothing to rescore
+        try:
+            collection_profiles[collection_name] = profile_of(client.get_collection(collection_name))
+        except Exception as e:
+            print(f"Cannot read the storage profile of '{collection_name}', using '{DEFAULT_PROFILE}': {e}")
+            return DEFAULT_PROFILE
+    return collection_profiles[collection_name]
+
+def forget_collection_profile(collection_name):
+    collection_profiles.pop(collection_name, None)
+
+def collection_search_params(client, collection_name, exact=False):
+    return search_params(collection_profile(client, collection_name), exact=exact)
+
+def builds_indexes(client):
+    # local-mode QdrantClient and LocalVectorClient search exactly and never build HNSW or quantized vectors
+    return hasattr(client, "get_collection") and not isinstance(getattr(client, "_client", None), QdrantLocal)
+
+def wait_for_index(client, collection_name, points, timeout=INDEX_TIMEOUT, interval=0.5):
+    # upload_collection(wait=True) only waits for the write to be applied: HNSW and
+    # quantization are built afterwards by the optimizer, and until then segments
+    # are searched plain and unquantized
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get_collection(collection_name)
+        if info.status == CollectionStatus.GREEN and (info.indexed_vectors_count or 0) >= points:
+            return True
+        if time.monotonic() > deadline:
+            print(f"'{collection_name}' is not fully indexed after {timeout:.0f}s ({info.indexed_vectors_count or 0}/{points} vectors).")
+            return False
+        time.sleep(interval)
+
+
+def recall_report(client, vectors, queries, distance, top_k=10, profiles=None, collection_prefix="storage_profile_report", batch_size=256):
+    # builds one collection per profile from `vectors`, then compares each profile's
+    # top_k for `queries` against exact (brute force) search: recall@k and latency
+    vectors = np.asarray(vectors, dtype=np.float32)
+    report = {}
+    if not builds_indexes(client):
+        print("This client never builds indexes or quantized vectors: every profile is measured as exact search.")
+    for profile in profiles or list(STORAGE_PROFILES):
+        collection_name = f"{collection_prefix}_{profile}"
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=vector_params(vectors.shape[1], distance, profile),
+            quantization_config=quantization_config(profile),
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=REPORT_INDEXING_THRESHOLD_KB)
+        )
+        client.upload_collection(
+            collection_name=collection_name,
+            vectors=vectors,
+            ids=range(len(vectors)),
+            batch_size=batch_size,
+            wait=True
+        )
+        indexed = wait_for_index(client, collection_name, len(vectors)) if builds_indexes(client) else False
+
+        recalls = []
+        latencies = []
+        for query in queries:
+            query = np.asarray(query, dtype=np.float32)
+            exact = client.query_points(collection_name, query=query, limit=top_k, search_params=search_params(exact=True)).points
+            start = time.perf_counter()
+            approx = client.query_points(collection_name, query=query, limit=top_k, search_params=search_params(profile)).points
+            latencies.append(time.perf_counter() - start)
+            truth = {point.id for point in exact}
+            recalls.append(len(truth & {point.id for point in approx}) / max(len(truth), 1))
+
+        latencies_ms = np.asarray(latencies) * 1000.0
+        report[profile] = {
+            "recall_at_k": float(np.mean(recalls)),
+            "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+            "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+            "oversampling": get_profile(profile)["oversampling"],
+            "indexed": indexed
+        }
+        client.delete_collection(collection_name)
+    return report
@@ -1,24 +1,40 @@
-from PIL import Image
-from transformers import AutoFeatureExtractor, AutoModel
-import torch
 import os
+import sys
+import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from storage_profiles import collection_search_params , forget_collection_profile , quantization_config , vector_params
+from embedding_backends import build_image_backend
+from lazy import lazy
+from PIL import Image, UnidentifiedImageError
 
 
-extractor = AutoFeatureExtractor.from_pretrained("google/vit-base-patch16-224")
-model = AutoModel.from_pretrained("google/vit-base-patch16-224")
+MODEL_NAME = "google/vit-base-patch16-224"
 
+# loaded on first use, not at import
+@lazy
+def get_extractor():
+    from transformers import AutoFeatureExtractor
+    return AutoFeatureExtractor.from_pretrained(MODEL_NAME)
 
-client = QdrantClient("localhost", port=6333)
+@lazy
+def get_image_backend():
+    from transformers import AutoModel
+    return build_image_backend(AutoModel.from_pretrained(MODEL_NAME), MODEL_NAME)  # EMBEDDING_BACKEND=torch|onnx|onnx-int8
 
-client.create_collection(
-    collection_name="images",
-    vectors_config=VectorParams(size=768 , distance=Distance.COSINE)
-)
+@lazy
+def get_client():
+    return QdrantClient("localhost", port=6333)
 
-from PIL import Image, UnidentifiedImageError
+def create_collection():
+    get_client().create_collection(
+        collection_name="images",
+        vectors_config=vector_params(768, Distance.COSINE),
+        quantization_config=quantization_config()
+    )
+    forget_collection_profile("images")
 
 def get_image_embedding(image_path):
     try:
@@ -27,39 +43,40 @@ def get_image_embedding(image_path):
         print(f"Cannot open image file: {image_path}")
         return None
     
-    inputs = extractor(images=img, return_tensors="pt")
-    with torch.no_grad():
-        outputs = model(**inputs)
-
-    embedding = outputs.last_hidden_state[:,0,:].numpy().flatten()
+    inputs = get_extractor()(images=img, return_tensors="np")
+    embedding = get_image_backend().embed(inputs["pixel_values"]).flatten()
     return embedding
 
-image_dir = "hello"
-image_files = [f for f in os.listdir(image_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
+def index_images(image_dir):
+    image_files = [f for f in os.listdir(image_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
 
-points = []
-for i, image_file in enumerate(image_files):
-    image_path = os.path.join(image_dir, image_file)
-    embedding = get_image_embedding(image_path)
-    points.append(
-        PointStruct(
-            id=i,
-            vector=embedding.tolist(),
-            payload={"file_name": image_file, "path": image_path}
-        )
-    )
+    ids, vectors, payloads = [], [], []
+    for i, image_file in enumerate(image_files):
+        image_path = os.path.join(image_dir, image_file)
+        embedding = get_image_embedding(image_path)
+        if embedding is None:
+            continue
+        ids.append(i)
+        vectors.append(embedding)
+        payloads.append({"file_name": image_file, "path": image_path})
 
-client.upsert(collection_name="images", points=points)
+    if ids:
+        # one (n, 768) float32 array, sliced into batches by the client
+        get_client().upload_collection(collection_name="images", vectors=np.stack(vectors), payload=payloads, ids=ids, wait=True)
 
 def find_similar_images(query_image_path, top_k=5):
     query_embedding = get_image_embedding(query_image_path)
-    results = client.search(
+    results = get_client().query_points(
         collection_name="images",
-        query_vector=query_embedding.tolist(),
+        query=query_embedding,
+        search_params=collection_search_params(get_client(), "images"),
         limit=top_k
     )
-    return [(result.payload["file_name"], result.score) for result in results]
+    return [(result.payload["file_name"], result.score) for result in results.points]
 
 
-res = find_similar_images('ford.jpg')
-print(res)
\ No newline at end of file
+if __name__ == "__main__":
+    create_collection()
+    index_images("hello")
+    res = find_similar_images('ford.jpg')
+    print(res)
@@ -1,34 +1,51 @@
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+from qdrant_client.models import Distance
 
-import pandas as pd
 import uuid
-
-
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')  # Supports 50+ languages
-client = QdrantClient("localhost", port=6333)
-
-
-vector_size = model.get_sentence_embedding_dimension()
-client.create_collection(
-    collection_name="multilingual_docs",
-    vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
-)
-
-
-
-client.create_payload_index(
-    collection_name="multilingual_docs",
-    field_name="language",
-    field_schema="keyword"
-)
-client.create_payload_index(
-    collection_name="multilingual_docs",
-    field_name="topic",
-    field_schema="keyword"
-)
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from embedding_cache import EmbeddingCache , encode_with_cache
+from query_cache import LRUCache , ResultCache
+from storage_profiles import collection_search_params , forget_collection_profile , quantization_config , vector_params
+from lazy import lazy
+from payload_indexes import build_filter , create_payload_indexes
+from document_loader import CHUNK_SIZE , index_file
+
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+VECTOR_SIZE = 384
+PAYLOAD_INDEXES = {"language": "keyword", "topic": "keyword"}
+
+# loaded on first use, not at import
+@lazy
+def get_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)  # Supports 50+ languages
+
+@lazy
+def get_client():
+    return QdrantClient("localhost", port=6333)
+
+@lazy
+def get_doc_cache():
+    return EmbeddingCache(MODEL_NAME, VECTOR_SIZE)
+
+def encode(texts):
+    return get_model().encode(texts)
+
+def create_collection():
+    client = get_client()
+    if client.collection_exists("multilingual_docs"):
+        return  # kept so an interrupted index_corpus can resume into it
+    client.create_collection(
+        collection_name="multilingual_docs",
+        vectors_config=vector_params(VECTOR_SIZE, Distance.COSINE),
+        quantization_config=quantization_config()
+    )
+    forget_collection_profile("multilingual_docs")
+    create_payload_indexes(client, "multilingual_docs", PAYLOAD_INDEXES)
 
 
 
@@ -43,47 +60,61 @@ documents = [
 ]
 
 
-embeddings = model.encode([doc["text"] for doc in documents])
-points = [
-    PointStruct(
-        id=str(uuid.uuid4()),
-        vector=embedding.tolist(),
-        payload={
-            "text": doc["text"],
-            "language": doc["language"],
-            "topic": doc["topic"]
-        }
+def index_documents(documents):
+    embeddings = encode_with_cache(get_doc_cache(), [doc["text"] for doc in documents], encode)
+    get_client().upload_collection(
+        collection_name="multilingual_docs",
+        vectors=embeddings,
+        payload=[{"text": doc["text"], "language": doc["language"], "topic": doc["topic"]} for doc in documents],
+        ids=[str(uuid.uuid4()) for _ in documents],
+        wait=True
+    )
+    search_results.invalidate("multilingual_docs")
+
+def index_corpus(path, text_column="text", payload_columns=None, id_column=None, chunk_size=CHUNK_SIZE):
+    # CSV/TSV/JSONL/Parquet corpus of any size: read, encode and upload chunk by
+    # chunk, resuming from the file's checkpoint. Map the corpus' columns onto the
+    # indexed fields, e.g. payload_columns={"language": "lang", "topic": "category"}
+    return index_file(
+        get_client(),
+        "multilingual_docs",
+        path,
+        lambda texts: encode_with_cache(get_doc_cache(), texts, encode),
+        text_column,
+        payload_columns=payload_columns,
+        id_column=id_column,
+        chunk_size=chunk_size,
+        text_field="text",
+        after_upload=lambda ids: search_results.invalidate("multilingual_docs")
     )
-    for doc, embedding in zip(documents, embeddings)
-]
-client.upsert(collection_name="multilingual_docs", points=points)
+
+query_vectors = LRUCache(maxsize=4096)
+search_results = ResultCache(maxsize=10_000, ttl=60.0)
 
 def search_documents(query, language=None, topic=None, top_k=3):
-    query_vector = model.encode(query).tolist()
-    
-    # Build list of FieldCondition
-    conditions = []
-    if language:
-        conditions.append(
-            FieldCondition(key="language", match=MatchValue(value=language))
-        )
-    if topic:
-        conditions.append(
-            FieldCondition(key="topic", match=MatchValue(value=topic))
-        )
+    query_vector = query_vectors.get(query)
+    if query_vector is None:
+        query_vector = encode(query)
+        query_vectors.put(query, query_vector)
     
-    # Wrap in a Filter if we have any
-    query_filter = Filter(must=conditions) if conditions else None
+    # empty strings and None mean "any"
+    query_filter = build_filter({"language": language or None, "topic": topic or None}, PAYLOAD_INDEXES)
     
-    # Pass query_filter (not filter) to client.search
-    results = client.search(
+    key = ResultCache.key("multilingual_docs", None, query_vector, query_filter, top_k)
+    cached = search_results.get(key)
+    if cached is not None:
+        return [dict(hit) for hit in cached]
+
+    generation = search_results.generation("multilingual_docs")
+    results = get_client().query_points(
         collection_name="multilingual_docs",
-        query_vector=query_vector,
+        query=query_vector,
         limit=top_k,
-        query_filter=query_filter
-    )
+        query_filter=query_filter,
+        search_params=collection_search_params(get_client(), "multilingual_docs")
+    ).points
     
-    return [
+    hits = [
         {
             "text":    hit.payload["text"],
             "language": hit.payload.get("language"),
@@ -92,20 +123,30 @@ def search_documents(query, language=None, topic=None, top_k=3):
         }
         for hit in results
     ]
+    search_results.put(key, hits, generation)
+    return [dict(hit) for hit in hits]
 
     
 
-print("Search for 'artificial intelligence' in any language:")
-results = search_documents("artificial intelligence")
-for r in results:
-    print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
-
-print("\nSearch for 'énergie renouvelable' restricted to English:")
-results = search_documents("énergie renouvelable", language="en")
-for r in results:
-    print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
-
-print("\nSearch for '气候' in the environment topic:")
-results = search_documents("气候", topic="environment")
-for r in results:
-    print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
\ No newline at end of file
+if __name__ == "__main__":
+    create_collection()
+    # python multilingual.py [corpus.csv|.jsonl|.parquet [text_column]]
+    if len(sys.argv) > 1:
+        index_corpus(sys.argv[1], *sys.argv[2:3])
+    else:
+        index_documents(documents)
+
+    print("Search for 'artificial intelligence' in any language:")
+    results = search_documents("artificial intelligence")
+    for r in results:
+        print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
+
+    print("\nSearch for 'énergie renouvelable' restricted to English:")
+    results = search_documents("énergie renouvelable", language="en")
+    for r in results:
+        print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
+
+    print("\nSearch for '气候' in the environment topic:")
+    results = search_documents("气候", topic="environment")
+    for r in results:
+        print(f"[{r['language']}] {r['text']} - Score: {r['score']:.4f}")
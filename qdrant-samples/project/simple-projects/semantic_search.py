@@ -1,11 +1,36 @@
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance , VectorParams , PointStruct
-import numpy as np
+from qdrant_client.models import Distance
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from embedding_cache import EmbeddingCache , encode_with_cache
+from storage_profiles import collection_search_params , forget_collection_profile , quantization_config , vector_params
+from embedding_backends import EMBEDDING_BACKEND , build_text_backend
+from lazy import lazy
+from document_loader import CHUNK_SIZE , index_file
 
-model = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight model for embeddings
-client = QdrantClient("localhost", port=6333)
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+VECTOR_SIZE = 384
+
+# loaded on first use, not at import
+@lazy
+def get_text_backend():
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(MODEL_NAME)  # Lightweight model for embeddings
+    return build_text_backend(model, MODEL_NAME)  # EMBEDDING_BACKEND=torch|onnx|onnx-int8
+
+@lazy
+def get_client():
+    return QdrantClient("localhost", port=6333)
+
+@lazy
+def get_doc_cache():
+    return EmbeddingCache(MODEL_NAME if EMBEDDING_BACKEND == "torch" else f"{MODEL_NAME}@{EMBEDDING_BACKEND}", VECTOR_SIZE)
+
+def encode(texts):
+    return get_text_backend().encode(texts)
 
 documents = [
     {
@@ -88,38 +113,62 @@ documents = [
     },
 ]
 
-vector_size = model.get_sentence_embedding_dimension()
-client.create_collection(
-    collection_name="semantic_search",
-    vectors_config=VectorParams(
-        size=vector_size,
-        distance=Distance.COSINE
+def create_collection():
+    if get_client().collection_exists("semantic_search"):
+        return  # kept so an interrupted index_corpus can resume into it
+    get_client().create_collection(
+        collection_name="semantic_search",
+        vectors_config=vector_params(VECTOR_SIZE, Distance.COSINE),
+        quantization_config=quantization_config()
     )
-)
+    forget_collection_profile("semantic_search")
 
+def index_documents(documents):
+    embeddings = encode_with_cache(get_doc_cache(), [doc["description"] for doc in documents], encode)
 
+    get_client().upload_collection(
+        collection_name="semantic_search",
+        vectors=embeddings,
+        payload=documents,
+        ids=range(len(documents)),
+        wait=True
+    )
 
-points = [
-    PointStruct(
-        id = i ,
-        vector = model.encode(doc["description"]).tolist(),
-        payload = doc
-    ) for i , doc in enumerate(documents)
-]
-client.upsert( collection_name="semantic_search" , points=points)
-
+def index_corpus(path, text_column="description", payload_columns=None, id_column=None, chunk_size=CHUNK_SIZE):
+    # CSV/TSV/JSONL/Parquet corpus of any size: read, encode and upload chunk by
+    # chunk, resuming from the file's checkpoint (see document_loader.index_file)
+    return index_file(
+        get_client(),
+        "semantic_search",
+        path,
+        lambda texts: encode_with_cache(get_doc_cache(), texts, encode),
+        text_column,
+        payload_columns=payload_columns,
+        id_column=id_column,
+        chunk_size=chunk_size,
+        text_field="description"  # search() reads the text from here
+    )
 
 
 def search( query , top_k=3):
-    query_vector = model.encode(query).tolist()
-    results = client.query_points(
+    query_vector = encode([query])[0]
+    results = get_client().query_points(
         collection_name="semantic_search",
-        query_vector=query_vector,
+        query=query_vector,
+        search_params=collection_search_params(get_client(), "semantic_search"),
         limit=top_k
     )
 
-    return [(results.payload["text"], results.score) for results in results]
+    return [(hit.payload["description"], hit.score) for hit in results.points]
+
 
-results = search("How does Python programming work?")
-for text, score in results:
-    print(f"Score: {score:.4f} | {text}")
\ No newline at end of file
+if __name__ == "__main__":
+    create_collection()
+    # python semantic_search.py [corpus.csv|.jsonl|.parquet [text_column]]
+    if len(sys.argv) > 1:
+        index_corpus(sys.argv[1], *sys.argv[2:3])
+    else:
+        index_documents(documents)
+    results = search("How does Python programming work?")
+    for text, score in results:
+        print(f"Score: {score:.4f} | {text}")
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The project is a set of scripts, not a package: import them the way they import each other.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "multi-model"), os.path.join(ROOT, "shared")]
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    # main.py opens logfile.txt and the embedding caches relative to the working
+    # directory on import, so import it from a scratch directory
+    workdir = tmp_path_factory.mktemp("main")
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        main.logg.flush()  # the writer thread has opened its file once this returns
+    finally:
+        os.chdir(previous)
+    return main
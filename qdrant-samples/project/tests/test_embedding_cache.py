@@ -0,0 +1,62 @@
+import multiprocessing
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def vector(value, dim=4):
+    return np.full(dim, value, dtype=np.float32)
+
+def fill(cache_dir, start, count):
+    cache = EmbeddingCache("model", 4, cache_dir=cache_dir, max_entries=64)
+    for value in range(start, start + count):
+        cache.put(f"key-{value}", vector(value))
+
+
+def test_two_caches_on_one_directory_never_share_rows(tmp_path):
+    first = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=8)
+    second = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=8)
+    first.put("a", vector(1))
+    second.put("b", vector(2))
+    first.put("c", vector(3))
+
+    assert np.all(first.get("a") == 1) and np.all(second.get("a") == 1)
+    assert np.all(first.get("b") == 2) and np.all(second.get("b") == 2)
+    assert np.all(second.get("c") == 3)
+    assert len(first) == len(second) == 3
+
+
+def test_evicted_rows_are_misses_in_every_process(tmp_path):
+    first = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=2)
+    second = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=2)
+    first.put("a", vector(1))
+    first.put("b", vector(2))
+    assert np.all(first.get("a") == 1)  # b is now the least recently used
+    second.put("c", vector(3))
+
+    assert first.get("b") is None
+    assert np.all(first.get("a") == 1) and np.all(first.get("c") == 3)
+
+
+def test_entries_survive_a_killed_process(tmp_path):
+    cache = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    cache.put("a", vector(1))
+    # no save(): a reopened cache sees every put
+    reopened = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=4)
+    assert np.all(reopened.get("a") == 1)
+
+
+def test_concurrent_processes_keep_their_own_vectors(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=fill, args=(str(tmp_path), start, 30)) for start in (0, 1000)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    cache = EmbeddingCache("model", 4, cache_dir=str(tmp_path), max_entries=64)
+    assert len(cache) == 60
+    for value in [*range(30), *range(1000, 1030)]:
+        assert np.all(cache.get(f"key-{value}") == value)
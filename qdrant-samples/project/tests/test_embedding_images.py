@@ -0,0 +1,89 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from embedding_cache import EmbeddingCache
+from help import Logger
+from preprocess import preprocess_image
+
+
+class FakeImageBackend:
+    def embed(self, pixel_values):
+        return np.ones((len(pixel_values), 768), dtype=np.float32)
+
+
+def test_corrupt_image_is_skipped_and_the_batch_embedded(main_module, tmp_path):
+    main = main_module
+    paths = []
+    for name in ("a.png", "b.png"):
+        path = tmp_path / name
+        Image.new("RGB", (32, 32), (200, 10, 10)).save(path)
+        paths.append(str(path))
+    corrupt = tmp_path / "corrupt.jpg"
+    corrupt.write_bytes(b"\xff\xd8 not really a jpeg")
+    paths.insert(1, str(corrupt))
+
+    main.get_image_preprocess.override({"size": 16, "mean": (0.5, 0.5, 0.5), "std": (0.5, 0.5, 0.5)})
+    main.get_image_backend.override(FakeImageBackend())
+    main.get_image_cache.override(EmbeddingCache("test-vit", main.IMAGE_DIM, cache_dir=str(tmp_path / "cache"), max_entries=16))
+    main.get_preprocess_pool.override(ThreadPoolExecutor(max_workers=2))
+    log_file = tmp_path / "log.txt"
+    main.logg = Logger(log_file=str(log_file), json_lines=True)
+
+    embeddings, valid = main.embedding_images(paths, batch_size=2)
+
+    assert valid.tolist() == [True, False, True]
+    assert np.all(embeddings[[0, 2]] == 1.0)
+    assert np.all(embeddings[1] == 0.0)
+    main.logg.flush()
+    log = log_file.read_text(encoding="utf-8")
+    assert "Skipping image" in log and "corrupt.jpg" in log
+
+
+def test_decompression_bomb_is_an_error_record(tmp_path, monkeypatch):
+    path = tmp_path / "huge.png"
+    Image.new("RGB", (64, 64)).save(path)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 64)  # 64x64 is over twice the limit
+    pixels, error = preprocess_image(str(path), size=16)
+    assert pixels is None
+    assert error["error"] == "DecompressionBombError"
+
+
+class BreaksAfter:
+    # executor whose worker "dies" after `tasks` tasks, as a killed process pool would
+    def __init__(self, tasks):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.tasks = tasks
+
+    def submit(self, *args):
+        if self.tasks == 0:
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+        self.tasks -= 1
+        return self.pool.submit(*args)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def test_broken_preprocess_pool_is_replaced(main_module, tmp_path):
+    main = main_module
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"{i}.png"
+        Image.new("RGB", (32, 32), (i * 40, 0, 0)).save(path)
+        paths.append(str(path))
+    main.get_image_preprocess.override({"size": 16, "mean": (0.5, 0.5, 0.5), "std": (0.5, 0.5, 0.5)})
+    main.get_image_backend.override(FakeImageBackend())
+    main.get_image_cache.override(EmbeddingCache("test-vit-pool", main.IMAGE_DIM, cache_dir=str(tmp_path / "cache"), max_entries=16))
+    main.get_preprocess_pool.override(BreaksAfter(2))
+    try:
+        embeddings, valid = main.embedding_images(paths, batch_size=2)
+        assert valid.all()
+        assert not isinstance(main.get_preprocess_pool(), BreaksAfter)
+    finally:
+        main.get_preprocess_pool().shutdown()
+        main.get_preprocess_pool.override(ThreadPoolExecutor(max_workers=2))
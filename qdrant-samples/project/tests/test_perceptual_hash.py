@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+
+from perceptual_hash import HashIndex, popcount
+
+
+def test_nearest_matches_a_brute_force_scan():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(5000)]
+    index = HashIndex(4)
+    for value, key in enumerate(keys):
+        index.add(key, str(value))
+    stored = np.array(keys, dtype=np.uint64)
+    for _ in range(200):
+        query = keys[rng.randrange(len(keys))]
+        for _ in range(rng.randrange(7)):
+            query ^= 1 << rng.randrange(64)
+        distances = popcount(stored ^ np.uint64(query))
+        expected = int(distances.min()) if distances.min() <= 4 else None
+        match = index.nearest(query)
+        assert (match[0] if match else None) == expected
+
+
+def test_save_appends_and_load_keeps_the_latest_hash(tmp_path):
+    path = str(tmp_path / "index.hashes")
+    index = HashIndex(4)
+    index.add(0x0F, "a")
+    index.add(0xF0F0F0F0F0F0F0F0, "b")
+    index.save(path)
+    index.add(0xFFFF_0000_FFFF_0000, "a")  # a's image changed
+    index.save(path)
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("00000000000000")  # cut short by a crash
+
+    loaded = HashIndex.load(path, 4)
+    assert len(loaded) == 2
+    assert sorted(loaded.items()) == sorted(index.items())
+    assert loaded.nearest(0x0F) is None
+    assert loaded.nearest(0xFFFF_0000_FFFF_0001) == (1, "a")
+
+    loaded.add(0x1234, "c")
+    loaded.save(path)  # rewrites the torn log instead of appending to its last line
+    assert sorted(HashIndex.load(path, 4).items()) == sorted(loaded.items())
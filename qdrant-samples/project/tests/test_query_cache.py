@@ -0,0 +1,37 @@
+import numpy as np
+
+from query_cache import ResultCache
+
+
+def test_result_of_a_search_that_raced_a_write_is_not_served():
+    cache = ResultCache(maxsize=16, ttl=60.0)
+    key = ResultCache.key("images", "image", np.ones(4), None, 5)
+    generation = cache.generation("images")  # search sent
+    cache.invalidate("images")  # a write is acknowledged while it runs
+    cache.put(key, ["partial"], generation)
+    assert cache.get(key) is None
+
+    generation = cache.generation("images")
+    cache.put(key, ["complete"], generation)
+    assert cache.get(key) == ["complete"]
+
+
+class RecordingClient:
+    def __init__(self):
+        self.waits = []
+
+    def collection_exists(self, collection_name):
+        return True
+
+    def upload_collection(self, wait, **kwargs):
+        self.waits.append(wait)
+
+
+def test_uploads_wait_for_qdrant_while_results_are_cached(main_module):
+    main = main_module
+    client = RecordingClient()
+    main.get_client.override(client)
+    vectors = {"image": np.zeros((1, 4), dtype=np.float32)}
+    main.save_vectors_to_qdrant("images", [1], vectors, [{}], wait=False)
+    assert main.search_results.enabled
+    assert client.waits == [True]
@@ -0,0 +1,57 @@
+import asyncio
+
+import numpy as np
+from PIL import Image
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from embedding_cache import EmbeddingCache
+from manifest import point_id_for
+
+
+class CountingImageBackend:
+    def __init__(self, vector):
+        self.vector = vector
+        self.images = 0
+
+    def embed(self, pixel_values):
+        self.images += len(pixel_values)
+        return np.tile(self.vector, (len(pixel_values), 1))
+
+
+def test_stored_images_are_searched_by_point_id(main_module, tmp_path, monkeypatch):
+    main = main_module
+    import query_service
+    monkeypatch.setattr(query_service, "AsyncQdrantClient", lambda *args, **kwargs: AsyncQdrantClient(location=":memory:"))
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((4, main.IMAGE_DIM)).astype(np.float32)
+    stored_paths = [f"images/cats/stored_{i}.jpg" for i in range(4)]  # never read from disk
+    new_path = tmp_path / "new.png"
+    Image.new("RGB", (32, 32)).save(new_path)
+
+    backend = CountingImageBackend(vectors[2])
+    main.get_image_preprocess.override({"size": 16, "mean": (0.5, 0.5, 0.5), "std": (0.5, 0.5, 0.5)})
+    main.get_image_backend.override(backend)
+    main.get_image_cache.override(EmbeddingCache("test-vit-query", main.IMAGE_DIM, cache_dir=str(tmp_path / "cache"), max_entries=16))
+
+    async def run():
+        service = query_service.QueryService(collection_name="images")
+        await service.client.create_collection("images", vectors_config={"image": VectorParams(size=main.IMAGE_DIM, distance=Distance.COSINE)})
+        await service.client.upsert("images", points=[
+            PointStruct(id=point_id_for(path), vector={"image": vector}, payload={"file_name": path})
+            for path, vector in zip(stored_paths, vectors)
+        ])
+        try:
+            return await asyncio.gather(
+                service.find_similar_images(stored_paths[0], top_k=3),
+                service.find_similar_images(str(new_path), top_k=3)
+            )
+        finally:
+            await service.client.close()
+
+    by_id, by_vector = asyncio.run(run())
+    assert backend.images == 1  # only the file that is not in the collection was embedded
+    assert stored_paths[0] not in [name for name, _ in by_id]
+    assert len(by_id) == 3
+    assert by_vector[0][0] == stored_paths[2]